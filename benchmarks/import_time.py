@@ -0,0 +1,73 @@
+"import_time.py"
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+try:
+    from typing import Dict, List, Tuple
+except ImportError:
+    from typing_extensions import Dict, List, Tuple # type: ignore
+
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must never be pulled in by a bare `import training_manager`
+FORBIDDEN_PREFIXES = ("slack_sdk", "aiohttp", "asyncio", "sqlite3", "numpy", "matplotlib")
+
+
+def measure(module: str) -> Tuple[int, Dict[str, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(ROOT), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+
+    # Lines look like `import time:       909 |      29094 | training_manager`
+    cumulative: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        cumulative[name] = int(cumulative_us)
+
+    return (cumulative[module], cumulative)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that `import training_manager` stays cheap")
+    parser.add_argument("--module", default="training_manager")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="fail if the median cumulative import time exceeds this")
+    args = parser.parse_args()
+
+    samples: List[int] = []
+    imported: Dict[str, int] = {}
+    for _ in range(args.repeat):
+        total, imported = measure(args.module)
+        samples.append(total)
+
+    median_ms = statistics.median(samples) / 1000
+    print(f"{args.module}: median {median_ms:.1f} ms, min {min(samples) / 1000:.1f} ms over {args.repeat} runs")
+
+    slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[:10]
+    for name, us in slowest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    forbidden = sorted(name for name in imported if name.split(".")[0] in FORBIDDEN_PREFIXES)
+    if forbidden:
+        print(f"FAIL: eagerly imported {', '.join(forbidden)}")
+        failed = True
+
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
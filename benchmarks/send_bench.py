@@ -0,0 +1,301 @@
+"send_bench.py"
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+try:
+    from typing import Tuple, Optional, Dict, List, Any, Callable, NamedTuple
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, List, Any, Callable, NamedTuple # type: ignore
+
+from pathlib import Path
+
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from training_manager import TrainingManager
+from training_manager.transport import TRANSPORTS, POOLED, DEFAULT_POOL_SIZE, DEFAULT_HTTP_TIMEOUT, resolve_transport, create_web_client
+
+
+MODES = ("sync", "queued", "async")
+METHODS = ("send_plain_message", "send_rich_block", "send_training_start", "send_progress", "send_error", "send_result", "send_file")
+RUN_ID = "bench"
+USER_ID = "U0BENCH"
+
+# Compared against a baseline with --baseline (lower is better for all of them), with the change below which
+# a difference is noise rather than a regression
+COMPARED_FIELDS = {"p50_ms": 0.05, "p99_ms": 0.5, "cpu_us_per_op": 10.0, "peak_kib": 16.0}
+
+BLOCKS = [
+    {"type": "header", "text": {"type": "plain_text", "text": "benchmark", "emoji": True}},
+    {"type": "section", "text": {"type": "mrkdwn", "text": "*rich block* for the benchmark"}},
+]
+
+
+class Result(NamedTuple):
+    mode: str
+    method: str
+    ops: int
+    errors: int
+    ops_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    cpu_us_per_op: float
+    api_calls_per_op: float
+    ratelimited: int
+    peak_kib: float
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest rank, so the result is always an observed latency
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+
+    return sorted_values[index]
+
+
+def optionals(i: int) -> List[Dict[str, Any]]:
+    return [{"epoch": i // 100, "step": i, "loss": 1 / (i + 1), "acc": 0.5 + i / 1e6, "lr": 3e-4}]
+
+
+def make_calls(file_path: Path) -> Dict[str, Callable[[Any, int], Any]]:
+    # The same calls serve every mode: in async mode they return coroutines
+    return {
+        "send_plain_message": lambda m, i: m.send_plain_message(f"benchmark message {i}"),
+        "send_rich_block": lambda m, i: m.send_rich_block("benchmark", BLOCKS),
+        "send_training_start": lambda m, i: m.send_training_start(RUN_ID, optionals(i)),
+        "send_progress": lambda m, i: m.send_progress(RUN_ID, optionals(i)),
+        "send_error": lambda m, i: m.send_error(RUN_ID, {"step": i, "error": "RuntimeError: benchmark"}, reply_broadcast=False),
+        "send_result": lambda m, i: m.send_result(RUN_ID, optionals(i)[0]),
+        "send_file": lambda m, i: m.send_file(file_path, title=f"file {i}"),
+    }
+
+
+class Stub:
+    # The stand-in server runs in its own process so its CPU time and memory are not counted as the client's
+    def __init__(self, latency: float, jitter: float, ratelimit_rate: float, retry_after: int, seed: Optional[int]) -> None:
+        self._proc = subprocess.Popen(
+            [sys.executable, str(HERE / "slack_stub.py"), "--latency", str(latency), "--jitter", str(jitter),
+             "--ratelimit-rate", str(ratelimit_rate), "--retry-after", str(retry_after)]
+            + ([] if seed is None else ["--seed", str(seed)]),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+        )
+        self.url = self._proc.stdout.readline().strip()
+        if not self.url:
+            self.close()
+            raise RuntimeError("slack_stub.py did not start")
+        self._control = self.url.split("/api/", 1)[0]
+
+    def reset(self) -> None:
+        urllib.request.urlopen(urllib.request.Request(f"{self._control}/_reset", data=b"", method="POST")).read()
+
+    def stats(self) -> Dict[str, Any]:
+        with urllib.request.urlopen(f"{self._control}/_stats") as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def close(self) -> None:
+        self._proc.stdin.close()
+        try:
+            self._proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+
+def create_manager(mode: str, url: str, args: argparse.Namespace) -> Any:
+    token = f"xoxb-bench-{mode}"
+    if mode == "async":
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        from training_manager import AsyncTrainingManager
+
+        manager = AsyncTrainingManager(token, USER_ID, rate_limit=args.rate_limit, channel_cache=None)
+        manager.client = AsyncWebClient(token=token, base_url=url)
+        return manager
+
+    manager = TrainingManager(token, USER_ID, queued=(mode == "queued"), queue_size=max(args.ops, 1024),
+                              rate_limit=args.rate_limit, channel_cache=None, transport=args.transport)
+    manager.client = create_web_client(token, resolve_transport(args.transport, DEFAULT_POOL_SIZE, DEFAULT_HTTP_TIMEOUT), base_url=url)
+
+    return manager
+
+
+def count_errors(results: List[Any]) -> int:
+    errors = 0
+    for result in results:
+        if isinstance(result, tuple) and not result[0]:
+            errors += 1
+
+    return errors
+
+
+def run_sync(manager: Any, call: Callable[[Any, int], Any], ops: int, drain: bool) -> Tuple[List[float], List[Any]]:
+    latencies: List[float] = []
+    results: List[Any] = []
+    for i in range(ops):
+        started = time.perf_counter()
+        results.append(call(manager, i))
+        latencies.append(time.perf_counter() - started)
+    if drain and not manager.flush(600):
+        raise RuntimeError("the queue did not drain within 600 s")
+
+    return (latencies, results)
+
+
+async def run_async(manager: Any, call: Callable[[Any, int], Any], ops: int) -> Tuple[List[float], List[Any]]:
+    latencies: List[float] = []
+    results: List[Any] = []
+    for i in range(ops):
+        started = time.perf_counter()
+        results.append(await call(manager, i))
+        latencies.append(time.perf_counter() - started)
+
+    return (latencies, results)
+
+
+def run(mode: str, manager: Any, call: Callable[[Any, int], Any], ops: int) -> Tuple[List[float], List[Any]]:
+    if mode == "async":
+        return asyncio.run(run_async(manager, call, ops))
+
+    return run_sync(manager, call, ops, drain=(mode == "queued"))
+
+
+def bench(mode: str, method: str, manager: Any, call: Callable[[Any, int], Any], stub: Stub, args: argparse.Namespace) -> Result:
+    # One untimed call opens the DM channel and the keep-alive connections
+    run(mode, manager, call, 1)
+    stub.reset()
+
+    gc.collect()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    latencies, results = run(mode, manager, call, args.ops)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    stats = stub.stats()
+
+    # Memory is traced in a separate pass: tracemalloc slows every allocation down and would skew the timings
+    peak = 0
+    if args.memory_ops > 0:
+        gc.collect()
+        tracemalloc.start()
+        run(mode, manager, call, args.memory_ops)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    latencies.sort()
+    return Result(
+        mode=mode, method=method, ops=args.ops, errors=count_errors(results),
+        ops_per_s=args.ops / wall if wall > 0 else float("inf"),
+        p50_ms=percentile(latencies, 50) * 1e3, p95_ms=percentile(latencies, 95) * 1e3, p99_ms=percentile(latencies, 99) * 1e3,
+        cpu_us_per_op=cpu / args.ops * 1e6, api_calls_per_op=sum(stats["calls"].values()) / args.ops,
+        ratelimited=stats["ratelimited"], peak_kib=peak / 1024,
+    )
+
+
+def print_results(results: List[Result]) -> None:
+    header = f"{'mode':<7} {'method':<20} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cpu us/op':>10} {'api/op':>7} {'429':>5} {'peak KiB':>9} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.mode:<7} {r.method:<20} {r.ops_per_s:>9.1f} {r.p50_ms:>8.3f} {r.p95_ms:>8.3f} {r.p99_ms:>8.3f} "
+              f"{r.cpu_us_per_op:>10.1f} {r.api_calls_per_op:>7.2f} {r.ratelimited:>5d} {r.peak_kib:>9.1f} {r.errors:>6d}")
+
+
+def compare(results: List[Result], config: Dict[str, Any], baseline_path: Path, tolerance: float) -> List[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    baseline = {(r["mode"], r["method"]): r for r in data["results"]}
+    if data.get("config") != config:
+        print(f"WARNING: {baseline_path} was recorded with different settings: {data.get('config')}", file=sys.stderr)
+
+    regressions = []
+    for r in results:
+        base = baseline.get((r.mode, r.method))
+        if base is None:
+            continue
+        for field, noise in COMPARED_FIELDS.items():
+            old, new = base[field], getattr(r, field)
+            if old > 0 and new > old * (1 + tolerance) and new - old > noise:
+                regressions.append(f"{r.mode} {r.method}: {field} {old:.3f} -> {new:.3f} (+{(new / old - 1) * 100:.0f}%)")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure what each send_* call costs against a local Slack API stand-in")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--ops", type=int, default=200, help="timed calls per mode and method")
+    parser.add_argument("--memory-ops", type=int, default=50, help="calls in the separate tracemalloc pass (0 to skip)")
+    parser.add_argument("--latency", type=float, default=0.005, help="stub latency per API call, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.002, help="extra uniform stub latency, in seconds")
+    parser.add_argument("--ratelimit-rate", type=float, default=0.0, help="fraction of API calls the stub answers with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with each 429")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the client-side rate limiter on (it paces to Slack's tiers)")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=POOLED)
+    parser.add_argument("--file-size", type=int, default=64 << 10, help="bytes uploaded by send_file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="write the results here")
+    parser.add_argument("--baseline", type=Path, default=None, help="fail if results regress against this --json output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression against --baseline")
+    args = parser.parse_args()
+
+    if "async" in args.modes:
+        try:
+            import aiohttp # noqa: F401
+        except ImportError:
+            print("Skipping async mode: it requires `aiohttp`. Install it with `pip3 install aiohttp`", file=sys.stderr)
+            args.modes = [mode for mode in args.modes if mode != "async"]
+
+    stub = Stub(args.latency, args.jitter, args.ratelimit_rate, args.retry_after, args.seed)
+    results: List[Result] = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            file_path = Path(tmp) / "bench.bin"
+            file_path.write_bytes(bytes(range(256)) * (args.file_size // 256) + bytes(args.file_size % 256))
+            calls = make_calls(file_path)
+
+            for mode in args.modes:
+                manager = create_manager(mode, stub.url, args)
+                try:
+                    for method in args.methods:
+                        results.append(bench(mode, method, manager, calls[method], stub, args))
+                        print(f"  {mode} {method} done", file=sys.stderr)
+                finally:
+                    manager.close()
+    finally:
+        stub.close()
+
+    print_results(results)
+
+    config = {key: getattr(args, key) for key in ("ops", "memory_ops", "latency", "jitter", "ratelimit_rate", "retry_after",
+                                                  "rate_limit", "transport", "file_size")}
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "config": config, "results": [r._asdict() for r in results]}, f, indent=2)
+
+    if args.baseline is not None:
+        regressions = compare(results, config, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
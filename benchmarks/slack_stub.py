@@ -0,0 +1,212 @@
+"slack_stub.py"
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+
+try:
+    from typing import Tuple, Optional, Dict, List, Any
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, List, Any # type: ignore
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.005, jitter: float = 0.002, ratelimit_rate: float = 0.0,
+                 retry_after: int = 0, seed: Optional[int] = None) -> None:
+        # Every API call sleeps latency + uniform(0, jitter) seconds; ratelimit_rate of them answer 429
+        self.latency = latency
+        self.jitter = jitter
+        self.ratelimit_rate = ratelimit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+        self.calls: Dict[str, int] = {}
+        self.ratelimited = 0
+        # POST /_fail?count=N&status=S: the next N API calls answer S with an HTML body, like a proxy in front of Slack
+        self.failures = 0
+        self.failure_status = 503
+        # (method, text) of every answered chat.postMessage / chat.update, in arrival order, for tests
+        self.messages: List[Tuple[str, Optional[str]]] = []
+
+
+class SlackStubHandler(BaseHTTPRequestHandler):
+    # Keep-alive and no Nagle, like slack.com: otherwise the stub, not the client, dominates small requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    config: StubConfig
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _payload(self, body: bytes) -> Dict[str, Any]:
+        content_type = self.headers.get("Content-Type", "")
+        payload: Dict[str, Any] = {}
+        if "json" in content_type:
+            payload = json.loads(body or b"{}")
+        elif "x-www-form-urlencoded" in content_type:
+            payload = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+        if "?" in self.path:
+            payload.update({key: values[0] for key, values in parse_qs(self.path.split("?", 1)[1]).items()})
+
+        return payload
+
+    def _reply(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _reply_html(self, status: int) -> None:
+        data = f"<html><body><h1>{status}</h1></body></html>".encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        config = self.config
+        if self.path == "/_stats":
+            with config.lock:
+                return self._reply(200, {"calls": dict(config.calls), "ratelimited": config.ratelimited,
+                                         "messages": list(config.messages)})
+
+        self._reply(404, {"ok": False, "error": "unknown_method"})
+
+    def do_POST(self) -> None:
+        config = self.config
+        body = self._read_body()
+        path = self.path.split("?", 1)[0]
+
+        if path == "/_reset":
+            with config.lock:
+                config.calls.clear()
+                config.ratelimited = 0
+                config.failures = 0
+                config.messages.clear()
+            return self._reply(200, {"ok": True})
+
+        if path == "/_fail":
+            payload = self._payload(body)
+            with config.lock:
+                config.failures = int(payload.get("count", 1))
+                config.failure_status = int(payload.get("status", 503))
+            return self._reply(200, {"ok": True})
+
+        if path.startswith("/upload/"):
+            # The upload URL handed out by files.getUploadURLExternal
+            with config.lock:
+                config.calls["upload"] = config.calls.get("upload", 0) + 1
+            return self._reply(200, {"ok": True})
+
+        method = path.rsplit("/", 1)[-1]
+        payload = self._payload(body)
+        with config.lock:
+            config.calls[method] = config.calls.get(method, 0) + 1
+            n = next(config.counter)
+            delay = config.latency + config.random.uniform(0, config.jitter)
+            failure = config.failure_status if config.failures > 0 else None
+            if failure is not None:
+                config.failures -= 1
+            ratelimited = failure is None and config.ratelimit_rate > 0 and config.random.random() < config.ratelimit_rate
+            if ratelimited:
+                config.ratelimited += 1
+
+        time.sleep(delay)
+
+        if failure is not None:
+            return self._reply_html(failure)
+
+        if ratelimited:
+            return self._reply(429, {"ok": False, "error": "ratelimited"}, {"Retry-After": str(config.retry_after)})
+
+        if method in ("chat.postMessage", "chat.update"):
+            with config.lock:
+                config.messages.append((method, payload.get("text")))
+
+        self._reply(200, self._respond(method, payload, n))
+
+    def _respond(self, method: str, payload: Dict[str, Any], n: int) -> Dict[str, Any]:
+        ts = f"{1600000000 + n}.{n % 1000000:06d}"
+        if method == "conversations.open":
+            return {"ok": True, "channel": {"id": "D0BENCH"}}
+        if method == "chat.postMessage":
+            return {"ok": True, "channel": "D0BENCH", "ts": ts}
+        if method == "chat.update":
+            return {"ok": True, "channel": "D0BENCH", "ts": payload.get("ts") or ts}
+        if method == "files.upload":
+            return {"ok": True, "file": {"id": f"F{n}", "permalink": f"https://files.example/F{n}", "shares": {}}}
+        if method == "files.getUploadURLExternal":
+            return {"ok": True, "file_id": f"F{n}", "upload_url": f"http://{self.headers.get('Host')}/upload/F{n}"}
+        if method == "files.completeUploadExternal":
+            files = json.loads(payload.get("files") or "[]")
+            return {"ok": True, "files": [{"id": f["id"], "permalink": f"https://files.example/{f['id']}"} for f in files]}
+        if method == "files.info":
+            return {"ok": True, "file": {"id": payload.get("file"), "permalink": "https://files.example/info", "shares": {}}}
+
+        return {"ok": True}
+
+
+def start(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    handler = type("Handler", (SlackStubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="slack-stub", daemon=True).start()
+
+    return (server, f"http://{host}:{server.server_port}/api/")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="A local stand-in for the Slack Web API methods training_manager calls")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every API call")
+    parser.add_argument("--jitter", type=float, default=0.002, help="up to this many more seconds, uniformly")
+    parser.add_argument("--ratelimit-rate", type=float, default=0.0, help="fraction of API calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with each 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.ratelimit_rate, args.retry_after, args.seed)
+    server, url = start(config, args.host, args.port)
+    # The first line of output is the base URL; a parent process reads it to find the port
+    print(url, flush=True)
+
+    try:
+        # Runs until stdin closes, so the stub never outlives the benchmark that started it
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
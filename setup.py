@@ -14,6 +14,11 @@ PYTHON_REQUIRES = ">=3.6"
 INSTALL_REQUIRES = [
     "slack-sdk==3.11.2",
 ]
+EXTRAS_REQUIRE = {
+    "async": ["aiohttp>=3.7.3,<4"],
+    "zstd": ["zstandard"],
+    "plot": ["numpy", "matplotlib"],
+}
 PACKAGES = setuptools.find_packages()
 CLASSIFIERS =[
     'Programming Language :: Python :: 3',
@@ -37,6 +42,7 @@ setuptools.setup(
     version=VERSION,
     python_requires=PYTHON_REQUIRES,
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     packages=PACKAGES,
     classifiers=CLASSIFIERS
 )
@@ -0,0 +1,98 @@
+"conftest.py"
+
+import json
+import subprocess
+import sys
+import urllib.request
+from pathlib import Path
+
+try:
+    from typing import Iterator, Dict, List, Any
+except ImportError:
+    from typing_extensions import Iterator, Dict, List, Any # type: ignore
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import slack_stub # noqa: E402
+
+from training_manager import TrainingManager # noqa: E402
+from training_manager.retry import RetryPolicy # noqa: E402
+from training_manager.transport import create_web_client # noqa: E402
+
+
+TOKEN = "xoxb-test"
+USER_ID = "U0TEST"
+
+
+class Stub:
+    # The slack_stub.py server, in this process
+    def __init__(self) -> None:
+        self.server, self.url = slack_stub.start(slack_stub.StubConfig(latency=0.0, jitter=0.0, seed=0))
+        self.root = self.url.rsplit("/api/", 1)[0]
+
+    def _post(self, path: str) -> Dict[str, Any]:
+        with urllib.request.urlopen(urllib.request.Request(f"{self.root}{path}", data=b"", method="POST")) as response:
+            return json.loads(response.read())
+
+    def reset(self) -> None:
+        self._post("/_reset")
+
+    def fail(self, count: int, status: int = 503) -> None:
+        self._post(f"/_fail?count={count}&status={status}")
+
+    def stats(self) -> Dict[str, Any]:
+        with urllib.request.urlopen(f"{self.root}/_stats") as response:
+            return json.loads(response.read())
+
+    def calls(self) -> Dict[str, int]:
+        return self.stats()["calls"]
+
+    def texts(self) -> List[str]:
+        return [text for _, text in self.stats()["messages"]]
+
+
+@pytest.fixture(scope="session")
+def stub() -> Iterator[Stub]:
+    stub = Stub()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def make_manager(stub: Stub, tmp_path: Path) -> Iterator[Any]:
+    stub.reset()
+    managers = []
+
+    def make_manager(**kwargs: Any) -> TrainingManager:
+        kwargs.setdefault("channel_cache", None)
+        kwargs.setdefault("rate_limit", False)
+        kwargs.setdefault("retry", RetryPolicy(max_attempts=3, base_delay=0.0, jitter=False))
+        manager = TrainingManager(TOKEN, kwargs.pop("user_id", USER_ID), **kwargs)
+        manager.client = create_web_client(TOKEN, manager._pool, base_url=stub.url)
+        managers.append(manager)
+        return manager
+
+    yield make_manager
+    for manager in managers:
+        manager.close()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # Default caches (channels, uploads) go to a per-test directory, never the real home
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def run_python(tmp_path: Path) -> Any:
+    # Runs code in a fresh interpreter that imports this checkout, with a minimal environment
+    def run_python(code: str) -> "subprocess.CompletedProcess[bytes]":
+        env = {"PATH": "/usr/bin:/bin", "PYTHONPATH": str(ROOT)}
+        return subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    return run_python
@@ -0,0 +1,33 @@
+"test_async.py"
+
+import asyncio
+import io
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from training_manager import AsyncTrainingManager # noqa: E402
+
+
+def test_send_file_returns_the_file_id(stub, tmp_path):
+    from slack_sdk.web.async_client import AsyncWebClient
+
+    stub.reset()
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"epoch 1\n")
+
+    async def send_files():
+        manager = AsyncTrainingManager("xoxb-test", "U0TEST", rate_limit=False, channel_cache=None)
+        manager.client = AsyncWebClient(token="xoxb-test", base_url=stub.url)
+        return [
+            await manager.send_file(path),
+            await manager.send_file(b"weights", filename="model.bin"),
+            await manager.send_file(io.BytesIO(b"config"), filename="config.yaml"),
+        ]
+
+    results = asyncio.run(send_files())
+
+    assert all(result and file_id.startswith("F") for result, file_id in results)
+    assert stub.calls()["upload"] == 3
+    assert stub.calls()["files.completeUploadExternal"] == 3
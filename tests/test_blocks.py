@@ -0,0 +1,31 @@
+"test_blocks.py"
+
+import pytest
+
+from training_manager.blocks import BlockBuilder, MAX_BLOCKS_PER_MESSAGE, MAX_FIELDS_PER_SECTION
+
+
+@pytest.mark.parametrize("group_sizes", [[600], [100] * 6, [1, 9, 10, 11, 19, 250, 300]])
+def test_600_key_progress_pages(group_sizes):
+    optionals, n = [], 0
+    for size in group_sizes:
+        optionals.append({f"metric{n + i}": i for i in range(size)})
+        n += size
+    assert n == 600
+
+    builder = BlockBuilder()
+    _, blocks = builder._build_progress("run", optionals)
+    pages = builder._paginate_blocks(blocks)
+
+    assert len(pages) > 1
+    texts = []
+    for page in pages:
+        assert 0 < len(page) <= MAX_BLOCKS_PER_MESSAGE
+        assert page[0]["type"] != "divider" and page[-1]["type"] != "divider"
+        for block in page:
+            if block["type"] == "section":
+                assert len(block["fields"]) <= MAX_FIELDS_PER_SECTION
+                texts.extend(field["text"] for field in block["fields"])
+
+    # Every field, in order, and none cut
+    assert texts == [f"*{key}:* \n{value}" for optional in optionals for key, value in optional.items()]
@@ -0,0 +1,40 @@
+"test_daemon.py"
+
+import threading
+
+import pytest
+
+from training_manager.daemon import NotificationDaemon, DaemonClient
+from training_manager.store import MemoryStore
+from training_manager.transport import create_web_client
+
+from conftest import TOKEN, USER_ID
+
+
+@pytest.fixture
+def daemon(stub, tmp_path):
+    stub.reset()
+    daemon = NotificationDaemon(TOKEN, str(tmp_path / "daemon.sock"), MemoryStore(), record_history=True)
+    manager = daemon.manager(USER_ID)
+    manager.client = create_web_client(TOKEN, manager._pool, base_url=stub.url)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.stop()
+    thread.join(5)
+
+
+def test_client_forwards_record_and_send_plot(stub, daemon):
+    pytest.importorskip("matplotlib")
+    client = DaemonClient(USER_ID, daemon.socket_path)
+    try:
+        for step in range(1, 4):
+            assert client.send_progress("run", [{"step": step, "loss": 1.0 / step}]) == (True, "")
+        client.record("run", {"accuracy": 0.9}, step=3)
+        assert client.send_plot("run", ["loss", "accuracy"]) == (True, "")
+        assert client.flush(30)
+    finally:
+        client.close()
+
+    calls = stub.calls()
+    assert calls.get("files.upload", 0) + calls.get("files.completeUploadExternal", 0) == 1
@@ -0,0 +1,85 @@
+"test_distributed.py"
+
+import os
+import time
+
+from training_manager.distributed import DistributedContext, RankInfo, default_socket_path
+from training_manager.sender import Job
+from training_manager.values import RankStats
+
+
+def test_two_runs_on_one_node_get_different_sockets(monkeypatch):
+    monkeypatch.delenv("TRAINING_MANAGER_SOCKET", raising=False)
+    monkeypatch.delenv("TRAINING_MANAGER_RUN_ID", raising=False)
+    # torchrun without --rdzv-id
+    monkeypatch.setenv("TORCHELASTIC_RUN_ID", "none")
+    monkeypatch.setenv("MASTER_ADDR", "127.0.0.1")
+
+    monkeypatch.setenv("MASTER_PORT", "29500")
+    first = default_socket_path()
+    monkeypatch.setenv("MASTER_PORT", "29501")
+    second = default_socket_path()
+    assert first != second
+
+    monkeypatch.delenv("MASTER_PORT")
+    assert "none" not in default_socket_path()
+
+
+def progress(id, step, seq):
+    return Job("progress", id, (id, [{"step": step, "loss": 0.1 * seq}]), {"report_seq": seq})
+
+
+def test_rank0_only_waits_for_peers_reporting_the_same_id(tmp_path):
+    path = str(tmp_path / "rank0.sock")
+    rank0 = DistributedContext(RankInfo(0, 0, 2, 2), path, aggregate_timeout=5.0)
+    rank1 = DistributedContext(RankInfo(1, 1, 2, 2), path, aggregate_timeout=5.0)
+    try:
+        rank1.forward({"type": "report", "rank": 1, "kind": "progress", "id": "train", "seq": 1,
+                       "payload": [{"step": 1, "loss": 0.3}]})
+        deadline = time.monotonic() + 5
+        while ("progress", "train") not in rank0._latest and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        job = rank0.aggregate(progress("eval", 1, 1))
+        assert time.monotonic() - started < 1
+        assert job.args[1] == [{"step": 1, "loss": 0.1}]
+
+        job = rank0.aggregate(progress("train", 1, 1))
+        assert job.args[1][0]["step"] == 1
+        assert isinstance(job.args[1][0]["loss"], RankStats)
+    finally:
+        rank1.close()
+        rank0.close()
+
+
+def test_second_rank0_does_not_take_over_the_socket(tmp_path):
+    path = str(tmp_path / "rank0.sock")
+    first = DistributedContext(RankInfo(0, 0, 2, 2), path)
+    second = DistributedContext(RankInfo(0, 0, 2, 2), path)
+    second.close()
+    rank1 = DistributedContext(RankInfo(1, 1, 2, 2), path)
+    try:
+        assert os.path.exists(path)
+        rank1.forward({"type": "report", "rank": 1, "kind": "progress", "id": "train", "seq": 1,
+                       "payload": [{"step": 1}]})
+        deadline = time.monotonic() + 5
+        while ("progress", "train") not in first._latest and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ("progress", "train") in first._latest
+    finally:
+        rank1.close()
+        first.close()
+
+
+def test_error_is_posted_directly_when_rank0_is_unreachable(stub, make_manager, monkeypatch, tmp_path):
+    monkeypatch.setenv("WORLD_SIZE", "2")
+    monkeypatch.setenv("RANK", "1")
+    monkeypatch.setenv("TRAINING_MANAGER_SOCKET", str(tmp_path / "nobody.sock"))
+    manager = make_manager(distributed=True)
+
+    assert manager.send_progress("run", [{"step": 1}]) == (True, "")
+    assert "chat.postMessage" not in stub.calls()
+
+    assert manager.send_error("run", {"error": "CUDA out of memory"}) == (True, "")
+    assert stub.calls()["chat.postMessage"] == 1
@@ -0,0 +1,36 @@
+"test_formatter.py"
+
+from training_manager.blocks import MAX_FIELD_TEXT_LENGTH
+from training_manager.distributed import aggregate_optional
+from training_manager.formatter import ValueFormatter, Mrkdwn
+
+
+def test_default_keeps_tracebacks_whole():
+    traceback = "Traceback (most recent call last):\n" + "  File \"train.py\", line 1, in <module>\n" * 30
+
+    assert len(traceback) < MAX_FIELD_TEXT_LENGTH
+    assert ValueFormatter(escape=False).format_value("traceback", traceback) == traceback
+
+
+def test_aggregated_values_use_the_key_format():
+    aggregated = aggregate_optional([{"step": 10, "loss": 0.123456}, {"step": 10, "loss": 0.234567}])
+    values = ValueFormatter({"loss": ".2f"}).format_optional(aggregated)
+
+    assert values == {"step": "10", "loss": "0.18 (min 0.12 / max 0.23, n=2)"}
+
+
+def test_escaped_text_stays_within_the_limit():
+    formatter = ValueFormatter(max_length=20)
+
+    for n in range(15, 25):
+        text = formatter.format_value("path", "a" * n + "<&>" * 5)
+        assert len(text) <= 20
+        # No entity cut in half
+        assert text.rsplit("&", 1)[-1].startswith(("amp;", "lt;", "gt;")) or "&" not in text
+
+
+def test_mrkdwn_values_are_not_escaped():
+    link = Mrkdwn("<https://wandb.ai/run/1|wandb>")
+
+    assert ValueFormatter().format_value("run", link) == "<https://wandb.ai/run/1|wandb>"
+    assert ValueFormatter().format_value("run", "<https://wandb.ai/run/1|wandb>") == "&lt;https://wandb.ai/run/1|wandb&gt;"
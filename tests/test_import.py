@@ -0,0 +1,13 @@
+"test_import.py"
+
+
+def test_import_is_lazy(run_python):
+    # Paid for on first use, never by `import training_manager`
+    result = run_python(
+        "import sys\n"
+        "import training_manager\n"
+        "loaded = [name for name in ('slack_sdk', 'asyncio', 'numpy') if name in sys.modules]\n"
+        "assert not loaded, loaded\n"
+    )
+
+    assert result.returncode == 0, result.stdout.decode()
@@ -0,0 +1,116 @@
+"test_queued.py"
+
+import io
+import threading
+
+import pytest
+
+
+def test_reused_optionals_are_copied_at_submit(make_manager, monkeypatch):
+    manager = make_manager(queued=True)
+    sent = []
+    release = threading.Event()
+    send_progress = manager._send_progress
+
+    def blocked_send_progress(id, optionals, *args, **kwargs):
+        # The worker only reads the job once every step has been submitted
+        release.wait(5)
+        sent.append(optionals[0]["step"])
+        return send_progress(id, optionals, *args, **kwargs)
+
+    monkeypatch.setattr(manager, "_send_progress", blocked_send_progress)
+
+    metrics = {"loss": 0.5}
+    for step in range(3):
+        metrics["step"] = step
+        assert manager.send_progress("run", [metrics]) == (True, "")
+    metrics.clear()
+    release.set()
+
+    assert manager.flush(5)
+    assert sent == [0, 1, 2]
+
+
+def block_send_file(manager, monkeypatch):
+    uploaded = []
+    release = threading.Event()
+    send_file = manager._send_file
+
+    def blocked_send_file(source, *args, **kwargs):
+        release.wait(5)
+        uploaded.append(b"".join(bytes(chunk) for chunk in source.chunks()))
+        return send_file(source, *args, **kwargs)
+
+    monkeypatch.setattr(manager, "_send_file", blocked_send_file)
+    return uploaded, release
+
+
+def test_closed_file_is_uploaded(stub, make_manager, monkeypatch, tmp_path):
+    manager = make_manager(queued=True)
+    uploaded, release = block_send_file(manager, monkeypatch)
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"epoch 1\n")
+
+    with open(path, "rb") as f:
+        assert manager.send_file(f) == (True, "")
+    release.set()
+
+    assert manager.flush(5)
+    assert uploaded == [b"epoch 1\n"]
+    assert stub.calls()["files.completeUploadExternal"] == 1
+
+
+def test_bytesio_can_be_reused(stub, make_manager, monkeypatch):
+    manager = make_manager(queued=True)
+    uploaded, release = block_send_file(manager, monkeypatch)
+    buffer = io.BytesIO()
+
+    for text in (b"first", b"second"):
+        buffer.seek(0)
+        buffer.truncate()
+        buffer.write(text)
+        buffer.seek(0)
+        assert manager.send_file(buffer, filename="log.txt") == (True, "")
+    release.set()
+
+    assert manager.flush(5)
+    assert uploaded == [b"first", b"second"]
+
+
+def test_coalesce_progress_requires_queued(make_manager):
+    with pytest.raises(ValueError):
+        make_manager(coalesce_progress=True)
+
+
+def test_progress_is_merged_but_never_across_an_error(make_manager, monkeypatch):
+    manager = make_manager(queued=True, coalesce_progress=True)
+    sent = []
+    started, release = threading.Event(), threading.Event()
+
+    def record(kind):
+        def send(id, optional, *args, **kwargs):
+            started.set()
+            release.wait(5)
+            sent.append((kind, optional))
+            return (True, "")
+        return send
+
+    monkeypatch.setattr(manager, "_send_progress", record("progress"))
+    monkeypatch.setattr(manager, "_send_error", record("error"))
+
+    manager.send_progress("run", [{"step": 1}])
+    # The worker holds step 1, so the next updates wait in the queue and are merged there
+    assert started.wait(5)
+    manager.send_progress("run", [{"step": 2, "loss": 0.5}])
+    manager.send_progress("run", [{"step": 3}])
+    manager.send_error("run", {"error": "nan loss"})
+    manager.send_progress("run", [{"step": 4}])
+    release.set()
+
+    assert manager.flush(5)
+    assert sent == [
+        ("progress", [{"step": 1}]),
+        ("progress", [{"step": 3, "loss": 0.5}]),
+        ("error", {"error": "nan loss"}),
+        ("progress", [{"step": 4}]),
+    ]
@@ -0,0 +1,56 @@
+"test_retry.py"
+
+import pytest
+
+from training_manager.transport import TRANSPORTS
+from training_manager.retry import RetryPolicy
+from training_manager.utils import slack_error_code
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_html_503_is_retried(stub, make_manager, transport):
+    manager = make_manager(transport=transport)
+    manager.channel_id
+    stub.reset()
+    stub.fail(1)
+
+    assert manager.send_progress("run", [{"step": 1}]) == (True, "")
+    assert stub.calls()["chat.postMessage"] == 2
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_html_503_after_retries_is_an_error(stub, make_manager, transport):
+    manager = make_manager(transport=transport)
+    manager.channel_id
+    stub.reset()
+    stub.fail(3)
+
+    assert manager.send_progress("run", [{"step": 1}]) == (False, "service_unavailable")
+    assert stub.calls()["chat.postMessage"] == 3
+
+
+def test_dict_response_is_retryable():
+    from slack_sdk.errors import SlackApiError
+
+    error = SlackApiError("Received a response in a non-JSON format", {"status": 503, "headers": {}, "body": "<html>"})
+    assert RetryPolicy().is_retryable(error)
+    assert slack_error_code(error) == "service_unavailable"
+
+    error = SlackApiError("Received a response in a non-JSON format", {"status": 404, "headers": {}, "body": "<html>"})
+    assert not RetryPolicy().is_retryable(error)
+    assert slack_error_code(error) == "http_404"
+
+
+def test_channel_lookup_failure_is_an_error_result(stub, make_manager):
+    manager = make_manager()
+    stub.fail(3)
+
+    assert manager.send_progress("run", [{"step": 1}]) == (False, "service_unavailable")
+
+
+def test_channel_lookup_failure_is_spooled(stub, make_manager, tmp_path):
+    manager = make_manager(spool=tmp_path / "spool")
+    stub.fail(3)
+
+    assert manager.send_progress("run", [{"step": 1}]) == (True, "spooled")
+    assert manager.spooled == 1
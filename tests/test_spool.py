@@ -0,0 +1,84 @@
+"test_spool.py"
+
+from training_manager import replay
+from training_manager.spool import Spool
+from training_manager.store import JsonLinesStore
+
+from conftest import TOKEN
+
+
+def mobile_text(id):
+    return f"{id}の途中経過です"
+
+
+def spool_while_unreachable(stub, manager, ids):
+    stub.fail(1000)
+    for id in ids:
+        assert manager.send_progress(id, [{"step": 1}]) == (True, "spooled")
+    assert manager.send_file(b"weights", filename="model.bin") == (True, "spooled")
+    stub.reset()
+
+
+def test_spooled_jobs_drain_in_order_on_the_next_send(stub, make_manager, tmp_path):
+    spool_dir = tmp_path / "spool"
+    manager = make_manager(spool=spool_dir, spool_replay_interval=0.0)
+    spool_while_unreachable(stub, manager, ["a", "b", "c"])
+    assert manager.spooled == 4
+    assert len(list((spool_dir / "blobs").iterdir())) == 1
+
+    assert manager.send_progress("d", [{"step": 2}]) == (True, "")
+
+    assert manager.spooled == 0
+    assert stub.texts() == [mobile_text(id) for id in "abcd"]
+    # Replayed from its blob file, so small enough for files.upload
+    assert stub.calls()["files.upload"] == 1
+    # Acknowledged uploads take their blobs with them
+    assert not list((spool_dir / "blobs").iterdir())
+
+
+def test_spooled_jobs_drain_on_close(stub, make_manager, tmp_path):
+    spool_dir = tmp_path / "spool"
+    manager = make_manager(spool=spool_dir)
+    spool_while_unreachable(stub, manager, ["a", "b"])
+
+    manager.close()
+
+    assert stub.texts() == [mobile_text(id) for id in "ab"]
+    # A fully delivered log is removed
+    assert Spool.find(spool_dir) == []
+
+
+def test_replay_a_log_left_by_a_process_that_did_not_close(stub, run_python, monkeypatch, tmp_path):
+    spool_dir, ts_path = tmp_path / "spool", tmp_path / "ts.jsonl"
+    stub.reset()
+    stub.fail(1000)
+    result = run_python(
+        "import os\n"
+        "from training_manager import TrainingManager, JsonLinesStore\n"
+        "from training_manager.retry import RetryPolicy\n"
+        "from training_manager.transport import create_web_client\n"
+        f"manager = TrainingManager({TOKEN!r}, 'U0TEST', channel_cache=None, rate_limit=False,\n"
+        f"                          retry=RetryPolicy(max_attempts=1), spool={str(spool_dir)!r},\n"
+        f"                          ts_store=JsonLinesStore({str(ts_path)!r}))\n"
+        f"manager.client = create_web_client({TOKEN!r}, manager._pool, base_url={stub.url!r})\n"
+        "for id in ('a', 'b'):\n"
+        "    assert manager.send_progress(id, [{'step': 1}]) == (True, 'spooled')\n"
+        "os._exit(0)\n"
+    )
+    assert result.returncode == 0, result.stdout.decode()
+    stub.reset()
+
+    # The CLI builds its own manager; point its client at the stub
+    import training_manager.interface as interface
+    create_web_client = interface.create_web_client
+    monkeypatch.setattr(interface, "create_web_client",
+                        lambda token, pool=None, **kwargs: create_web_client(token, pool, base_url=stub.url, **kwargs))
+
+    assert replay.main([str(spool_dir), "--bot-token", TOKEN]) == 0
+
+    assert stub.texts() == [mobile_text(id) for id in "ab"]
+    assert Spool.find(spool_dir) == []
+    # The thread store recorded in the log (given as an instance) received the new threads
+    store = JsonLinesStore(ts_path)
+    assert sorted(key.rsplit("/", 1)[1] for key in store.keys() if ":thread/" in key) == ["a", "b"]
+    store.close()
@@ -0,0 +1,43 @@
+"test_store.py"
+
+from training_manager.store import JsonLinesStore, resolve_store
+
+
+def test_write_after_another_instance_compacts(tmp_path):
+    path = tmp_path / "ts.jsonl"
+    a = JsonLinesStore(path)
+    for step in range(100):
+        a.set("run", f"{step}")
+
+    # Enough stale lines that opening the file compacts it
+    b = JsonLinesStore(path)
+    assert b.get("run") == "99"
+    a.set("later", "1")
+    b.set("other", "2")
+    a.close()
+    b.close()
+
+    c = JsonLinesStore(path)
+    assert (c.get("run"), c.get("later"), c.get("other")) == ("99", "1", "2")
+    c.close()
+
+
+def test_resolve_store_shares_one_instance_per_path(tmp_path):
+    a, owns_a = resolve_store(tmp_path / "ts.jsonl")
+    b, owns_b = resolve_store(str(tmp_path / "ts.jsonl"))
+
+    assert a is b
+    assert not owns_a and not owns_b
+
+
+def test_import_and_channel_cache_without_a_home_directory(run_python):
+    result = run_python(
+        "import pathlib\n"
+        "def no_home(): raise RuntimeError('Could not determine home directory.')\n"
+        "pathlib.Path.home = staticmethod(no_home)\n"
+        "import training_manager\n"
+        "from training_manager.store import ChannelCache, DEFAULT_CHANNEL_CACHE\n"
+        "assert ChannelCache.open(DEFAULT_CHANNEL_CACHE) is None\n"
+    )
+
+    assert result.returncode == 0, result.stdout.decode()
@@ -0,0 +1,20 @@
+"test_upload.py"
+
+from training_manager.upload import UploadSource
+
+
+class Reader:
+    # Only `read()`: no seek, tell or seekable
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size=-1):
+        data, self.data = self.data, b""
+        return data
+
+
+def test_plain_reader_is_read_out():
+    source = UploadSource.create(Reader(b"epoch 1\n"), "log.txt")
+
+    assert source.length == 8
+    assert b"".join(bytes(chunk) for chunk in source.chunks()) == b"epoch 1\n"
@@ -0,0 +1,17 @@
+"test_upload_cache.py"
+
+from training_manager.store import MemoryStore
+
+
+def test_cached_upload_is_not_reused_for_another_recipient(stub, make_manager):
+    cache = MemoryStore()
+    alice = make_manager(user_id="U0ALICE", upload_cache=cache)
+    bob = make_manager(user_id="U0BOB", upload_cache=cache)
+
+    assert alice.send_file(b"weights", filename="model.bin")[0]
+    assert alice.send_file(b"weights", filename="model.bin")[0]
+    assert stub.calls()["files.completeUploadExternal"] == 1
+
+    # Bob was never shared the first upload, so its permalink would not open for him
+    assert bob.send_file(b"weights", filename="model.bin")[0]
+    assert stub.calls()["files.completeUploadExternal"] == 2
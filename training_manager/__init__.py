@@ -1,3 +1,21 @@
 """__init__.py"""
 
-from .interface import TrainingManager
\ No newline at end of file
+import sys
+
+from .interface import TrainingManager
+from .formatter import Mrkdwn
+from .store import MemoryStore, JsonLinesStore, SqliteStore
+
+# asyncio is only paid for by callers that actually use the async manager
+if sys.version_info >= (3, 7):
+    def __getattr__(name: str):
+        if name == "AsyncTrainingManager":
+            from .async_interface import AsyncTrainingManager
+            return AsyncTrainingManager
+        if name == "DaemonClient":
+            from .daemon import DaemonClient
+            return DaemonClient
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+else:
+    from .async_interface import AsyncTrainingManager
+    from .daemon import DaemonClient
@@ -0,0 +1,300 @@
+"async_interface.py"
+
+import asyncio
+import json
+import logging
+import time
+
+try:
+    from typing import Tuple, Union, Optional, Sequence, Dict, Any
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Sequence, Dict, Any # type: ignore
+
+from pathlib import Path
+
+from .blocks import BlockBuilder, HeaderBlock_t, BodyBlock_t
+from .formatter import ValueFormatter, Spec_t, DEFAULT_MAX_VALUE_LENGTH
+from .history import RecentValues, DEFAULT_SPARKLINE_LENGTH
+from .ratelimit import RateLimiter, get_retry_after
+from .retry import RetryPolicy, DEFAULT_RETRY
+from .store import Store, CacheFile, TsHolder, ChannelCache, resolve_store, DEFAULT_CHANNEL_CACHE, DEFAULT_CHANNEL_CACHE_TTL
+from .upload import FileLike_t, UploadSource, UploadTimeout, stream_upload
+from .utils import hash_token, slack_api_error, slack_error_code, RECIPIENT_ERRORS, response_status, response_headers
+from .values import resolve_optional
+
+
+logger = logging.getLogger(__name__)
+
+class AsyncTrainingManager(BlockBuilder):
+    def __init__(
+        self,
+        bot_token: str,
+        user_id: str,
+        rate_limit: bool = True,
+        max_ratelimit_retries: int = 10,
+        retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+        live_progress: bool = False,
+        ts_store: Optional[Union[str, Path, Store]] = None,
+        channel_cache: Optional[Union[str, Path, CacheFile, Store]] = DEFAULT_CHANNEL_CACHE,
+        channel_cache_ttl: float = DEFAULT_CHANNEL_CACHE_TTL,
+        sparkline_length: int = DEFAULT_SPARKLINE_LENGTH,
+        formats: Optional[Dict[Any, Spec_t]] = None,
+        max_value_length: Optional[int] = DEFAULT_MAX_VALUE_LENGTH,
+    ) -> None:
+        try:
+            from slack_sdk.web.async_client import AsyncWebClient
+        except ImportError:
+            raise ImportError("`AsyncTrainingManager` requires `aiohttp`. Install it with `pip3 install aiohttp`") from None
+
+        self.client = AsyncWebClient(token=bot_token)
+
+        self._rate_limiter: Optional[RateLimiter] = RateLimiter.for_token(bot_token) if rate_limit else None
+        self.max_ratelimit_retries = max_ratelimit_retries
+        self.retry = retry
+
+        self.user_id = user_id
+        self._token_hash = hash_token(bot_token)
+
+        self.channel_id: Optional[str] = None
+        self._channel_cache = ChannelCache.open(channel_cache, channel_cache_ttl)
+
+        # Threads are keyed by token and user: the DM channel follows from both, so no lookup is needed to resume
+        self._ts_store, self._owns_ts_store = resolve_store(ts_store)
+        namespace = f"{self._token_hash}:{user_id}"
+        self._ts_holder = TsHolder(self._ts_store, f"{namespace}:thread")
+
+        self.live_progress = live_progress
+        self._progress_ts_holder = TsHolder(self._ts_store, f"{namespace}:progress")
+        self._recent = RecentValues(sparkline_length)
+        self.formatter = ValueFormatter(formats, max_length=max_value_length)
+
+        self._channel_lock: Optional[asyncio.Lock] = None
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _call_api(self, method: str, scope: Optional[str] = None, **kwargs: Any) -> Any:
+        retries = attempt = 0
+        started = time.monotonic()
+        while True:
+            if self._rate_limiter is not None:
+                wait = self._rate_limiter.reserve(method, scope)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            try:
+                api_method = getattr(self.client, method.replace(".", "_"), None)
+                if api_method is None:
+                    # Methods newer than the pinned slack_sdk have no wrapper yet
+                    return await self.client.api_call(method, data={k: v for k, v in kwargs.items() if v is not None})
+                return await api_method(**kwargs)
+            except slack_api_error() as e:
+                if response_status(e.response) == 429 and self._rate_limiter is not None and retries < self.max_ratelimit_retries:
+                    self._rate_limiter.penalize(method, get_retry_after(response_headers(e.response)), scope)
+                    retries += 1
+                    continue
+                error: BaseException = e
+            except Exception as e:
+                error = e
+
+            # Transient failures (5xx, resets, timeouts) back off with jitter; anything else is raised as is
+            delay = None if self.retry is None else self.retry.next_delay(attempt, started, error)
+            if delay is None:
+                raise error
+            if response_status(getattr(error, "response", None)) == 429:
+                delay = max(delay, get_retry_after(response_headers(error.response)))
+            logger.warning("%s failed (%s); retrying in %.1f s", method, error, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get_channel_id(self) -> str:
+        if self.channel_id is not None:
+            return self.channel_id
+
+        if self._channel_lock is None:
+            self._channel_lock = asyncio.Lock()
+
+        async with self._channel_lock:
+            if self.channel_id is None and self._channel_cache is not None:
+                self.channel_id = self._channel_cache.get(self._token_hash, self.user_id)
+
+            if self.channel_id is None:
+                try:
+                    response = await self._call_api("conversations.open", users=self.user_id)
+                except slack_api_error() as e:
+                    if slack_error_code(e) in RECIPIENT_ERRORS:
+                        raise ValueError(f"Cannot find channel name. Make sure `user_id` is valid") from None
+                    # Slack being unavailable is not the caller's mistake: reported as `(False, code)`
+                    raise
+                self.channel_id = response["channel"]["id"]
+
+                if self._channel_cache is not None:
+                    self._channel_cache.set(self._token_hash, self.user_id, self.channel_id)
+
+        return self.channel_id
+
+    def close(self) -> None:
+        if self._owns_ts_store:
+            self._ts_store.close()
+        else:
+            self._ts_store.sync()
+
+    def get_ts(self, id: str) -> Optional[str]:
+        return self._ts_holder.get(id)
+
+    def get_progress_ts(self, id: str) -> Optional[str]:
+        return self._progress_ts_holder.get(id)
+
+    async def send_plain_message(self, message: str) -> Tuple[bool, str]:
+        try:
+            channel_id = await self._get_channel_id()
+            response = await self._call_api(
+                "chat.postMessage",
+                channel_id,
+                channel=channel_id,
+                text=message
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+
+        return (True, response["ts"])
+
+    async def send_rich_block(self, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]],
+                              ts: Optional[str] = None, reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
+        try:
+            channel_id = await self._get_channel_id()
+            response = await self._call_api(
+                "chat.postMessage",
+                channel_id,
+                channel=channel_id,
+                text=mobile_text,
+                blocks=self._compose_blocks(blocks),
+                thread_ts=ts,
+                reply_broadcast=reply_broadcast,
+                icon_emoji=icon_emoji
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+
+        return (True, response["ts"])
+
+    async def _update_rich_block(self, ts: str, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]]) -> Tuple[bool, str]:
+        try:
+            channel_id = await self._get_channel_id()
+            response = await self._call_api(
+                "chat.update",
+                channel_id,
+                channel=channel_id,
+                ts=ts,
+                text=mobile_text,
+                blocks=self._compose_blocks(blocks)
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+
+        return (True, response["ts"])
+
+    async def send_file(self, path: FileLike_t, title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                        filename: Optional[str] = None) -> Tuple[bool, str]:
+        source = UploadSource.create(path, filename)
+
+        try:
+            channel_id = await self._get_channel_id()
+            response = await self._call_api("files.getUploadURLExternal", filename=source.filename, length=source.length)
+            # http.client blocks, so the bytes are sent from a worker thread while the event loop carries on
+            await asyncio.get_event_loop().run_in_executor(
+                None, stream_upload, response["upload_url"], source.chunks(), source.length
+            )
+            await self._call_api(
+                "files.completeUploadExternal",
+                files=json.dumps([{"id": response["file_id"], "title": title or source.filename}]),
+                channel_id=channel_id,
+                initial_comment=text,
+                thread_ts=ts
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+        except UploadTimeout:
+            return (False, "upload_timeout")
+        except OSError:
+            return (False, "upload_failed")
+
+        return (True, response["file_id"])
+
+    async def _send_to_thread(self, id: str, mobile_text: str, blocks: Sequence[Any],
+                              reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None,
+                              live: bool = False) -> Tuple[bool, str]:
+        first_page, *follow_up_pages = self._paginate_blocks(blocks)
+        if live and follow_up_pages:
+            # A live message is a single message, so only the first 50 blocks are kept
+            logger.warning("Live progress of `%s` exceeds %d blocks; the rest is omitted", id, len(first_page))
+            follow_up_pages = []
+
+        ts = self._ts_holder.get(f"{id}")
+        if ts is not None and not live:
+            result, ts_or_error = await self.send_rich_block(mobile_text, first_page, ts, reply_broadcast, icon_emoji)
+            if not result:
+                return (False, ts_or_error)
+            return await self._send_follow_up_pages(ts, mobile_text, follow_up_pages, icon_emoji)
+
+        # Concurrent first messages of one run must not open two threads
+        lock = self._thread_locks.setdefault(f"{id}", asyncio.Lock())
+        async with lock:
+            if live:
+                progress_ts = self._progress_ts_holder.get(f"{id}")
+                if progress_ts is not None:
+                    result, ts_or_error = await self._update_rich_block(progress_ts, mobile_text, first_page)
+                    if result or ts_or_error not in ("message_not_found", "cant_update_message"):
+                        return (True, "") if result else (False, ts_or_error)
+
+            ts = self._ts_holder.get(f"{id}")
+
+            result, ts_or_error = await self.send_rich_block(mobile_text, first_page, ts, reply_broadcast, icon_emoji)
+
+            if not result:
+                return (False, ts_or_error)
+
+            if ts is None:
+                ts = self._ts_holder[f"{id}"] = ts_or_error
+            if live:
+                self._progress_ts_holder[f"{id}"] = ts_or_error
+
+        return await self._send_follow_up_pages(ts, mobile_text, follow_up_pages, icon_emoji)
+
+    async def _send_follow_up_pages(self, ts: str, mobile_text: str, pages: Sequence[Sequence[Any]],
+                                    icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
+        for page in pages:
+            result, ts_or_error = await self.send_rich_block(mobile_text, page, ts, icon_emoji=icon_emoji)
+            if not result:
+                return (False, ts_or_error)
+
+        return (True, "")
+
+    async def send_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
+        if optionals is not None:
+            optionals = [resolve_optional(optional) for optional in optionals]
+        mobile_text, blocks = self._build_training_start(id, optionals)
+
+        return await self._send_to_thread(id, mobile_text, blocks)
+
+    async def send_progress(self, id: str, optionals: Optional[Sequence[dict]] = None, sparkline: bool = False) -> Tuple[bool, str]:
+        if optionals is not None:
+            # There is no sender thread here: tensors are read now, before the request is awaited
+            optionals = [resolve_optional(optional) for optional in optionals]
+        sparklines = None
+        if sparkline and optionals is not None:
+            for optional in optionals:
+                self._recent.record(f"{id}", optional)
+            sparklines = [self._recent.sparklines(f"{id}", optional) for optional in optionals]
+
+        mobile_text, blocks = self._build_progress(id, optionals, sparklines)
+
+        return await self._send_to_thread(id, mobile_text, blocks, live=self.live_progress)
+
+    async def send_error(self, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
+        mobile_text, blocks = self._build_error(id, resolve_optional(optional))
+
+        return await self._send_to_thread(id, mobile_text, blocks, reply_broadcast, icon_emoji=":warning:")
+
+    async def send_result(self, id: str, optional: dict) -> Tuple[bool, str]:
+        mobile_text, blocks = self._build_result(id, resolve_optional(optional))
+
+        return await self._send_to_thread(id, mobile_text, blocks)
@@ -0,0 +1,209 @@
+"blocks.py"
+
+try:
+    from typing import Tuple, Union, Optional, Sequence, Dict, List, Any
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Sequence, Dict, List, Any # type: ignore
+
+from functools import lru_cache
+
+from .formatter import ValueFormatter, DEFAULT_FORMATTER, truncate_mrkdwn, escape_mrkdwn
+
+
+HeaderBlock_t = Dict[str, Union[str, Dict[str, Union[str, bool]]]]
+BodyBlock_t = Dict[str, Union[str, List[Dict[str, str]]]]
+ComposedBlock_t = List[Union[HeaderBlock_t, BodyBlock_t]]
+
+# kind: (header text, mobile text, field label)
+MESSAGE_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "training_start": ("学習開始 --- {id}", "{id}の学習を開始しました", "*{key}:* \n"),
+    "progress": ("途中経過 --- {id}", "{id}の途中経過です", "*{key}:* \n"),
+    "error": ("エラーが発生しました --- {id}", "{id}でエラーが発生しました", "*{key}:* "),
+    "result": ("学習終了 --- {id}", "{id}の学習が終了しました", "*{key}* : "),
+}
+TEMPLATE_CACHE_SIZE = 1024
+LABEL_CACHE_SIZE = 256
+
+# https://api.slack.com/reference/block-kit/blocks
+MAX_FIELDS_PER_SECTION = 10
+MAX_FIELD_TEXT_LENGTH = 2000
+MAX_BLOCKS_PER_MESSAGE = 50
+
+class MessageTemplate:
+    # Static blocks are shared between messages; slack_sdk serializes them without mutating
+    def __init__(self, kind: str, id: str) -> None:
+        header_format, mobile_format, self._label_format = MESSAGE_FORMATS[kind]
+
+        self.mobile_text = mobile_format.format(id=id)
+        self.header_block: HeaderBlock_t = {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": header_format.format(id=id),
+                "emoji": True
+            }
+        }
+        self.divider_block: Dict[str, str] = {"type": "divider"}
+
+        self._labels: Dict[str, str] = {}
+
+    def label(self, key: Any) -> str:
+        label = self._labels.get(key)
+        if label is None:
+            label = self._label_format.format(key=escape_mrkdwn(f"{key}"))
+            if len(self._labels) < LABEL_CACHE_SIZE:
+                self._labels[key] = label
+
+        return label
+
+    def fields(self, optional: dict) -> List[Dict[str, str]]:
+        labels, label = self._labels, self.label
+        fields = [{"type": "mrkdwn", "text": f"{labels.get(key) or label(key)}{value}"} for key, value in optional.items()]
+        for field in fields:
+            if len(field["text"]) > MAX_FIELD_TEXT_LENGTH:
+                field["text"] = truncate_mrkdwn(field["text"], MAX_FIELD_TEXT_LENGTH)
+
+        return fields
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_template(kind: str, id: str) -> MessageTemplate:
+    return MessageTemplate(kind, id)
+
+class BlockBuilder:
+    # How optionals values are turned into text; managers replace it when given `formats`
+    formatter: ValueFormatter = DEFAULT_FORMATTER
+
+    def _get_header_block(self, text: str) -> HeaderBlock_t:
+        block: HeaderBlock_t = {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": text,
+                "emoji": True
+            }
+        }
+
+        return block
+
+    def _get_body_field(self, text: str) -> Dict[str, str]:
+        return {"type": "mrkdwn", "text": text}
+
+    def _get_body_block(self, fields: Sequence[Dict[str, str]]) -> BodyBlock_t:
+        block: BodyBlock_t = {
+            "type": "section",
+            "fields": fields
+        }
+
+        return block
+
+    def _get_body_blocks(self, fields_group: Sequence[Sequence[Dict[str, str]]]) -> BodyBlock_t:
+        blocks = []
+        for fields in fields_group:
+            if not fields:
+                continue
+            if blocks:
+                blocks.append(self._get_divider_block())
+            # A section holds at most 10 fields, so a large group continues in the following sections
+            for i in range(0, len(fields), MAX_FIELDS_PER_SECTION):
+                block: BodyBlock_t = {
+                    "type": "section",
+                    "fields": fields[i:i + MAX_FIELDS_PER_SECTION]
+                }
+                blocks.append(block)
+
+        return blocks
+
+    def _get_footer_block(self, text: str) -> BodyBlock_t:
+        block: BodyBlock_t = {
+            "type": "section",
+            "fields": [
+                {
+                    "type": "mrkdwn",
+                    "text": text
+                },
+            ]
+        }
+
+        return block
+
+    def _get_divider_block(self) -> Dict[str, str]:
+        return {"type": "divider"}
+
+    def _compose_blocks(self, blocks: Sequence[Any]) -> ComposedBlock_t:
+        composed_block: ComposedBlock_t = []
+        for block in blocks:
+            if block is not None:
+                composed_block.append(block)
+
+        return composed_block
+
+    def _paginate_blocks(self, blocks: Sequence[Any]) -> List[ComposedBlock_t]:
+        composed_block = self._compose_blocks(blocks)
+        if len(composed_block) <= MAX_BLOCKS_PER_MESSAGE:
+            return [composed_block]
+
+        pages: List[ComposedBlock_t] = []
+        page: ComposedBlock_t = []
+        for block in composed_block:
+            if block.get("type") == "divider" and (not page or len(page) >= MAX_BLOCKS_PER_MESSAGE - 1):
+                # Never start a follow-up message with a divider or end one on a divider
+                if len(page) >= MAX_BLOCKS_PER_MESSAGE - 1:
+                    pages.append(page)
+                    page = []
+                continue
+            if len(page) >= MAX_BLOCKS_PER_MESSAGE:
+                pages.append(page)
+                page = []
+            page.append(block)
+        if page:
+            pages.append(page)
+
+        return pages
+
+    def _format_optional(self, optional: dict, suffixes: Optional[Dict[Any, str]] = None) -> Dict[Any, str]:
+        values = self.formatter.format_optional(optional)
+        # Suffixes (sparklines) come after truncation so they are never cut off
+        if suffixes:
+            for key, suffix in suffixes.items():
+                if key in values:
+                    values[key] = f"{values[key]} {suffix}"
+
+        return values
+
+    def _build_fields_groups(self, kind: str, id: str, optionals: Optional[Sequence[dict]] = None,
+                             suffixes: Optional[Sequence[Dict[Any, str]]] = None) -> Tuple[str, List[Any]]:
+        template = get_template(kind, f"{id}")
+
+        body_groups = []
+        if optionals is not None:
+            for i, optional in enumerate(optionals):
+                body_groups.append(template.fields(self._format_optional(optional, suffixes[i] if suffixes else None)))
+
+        body_blocks = self._get_body_blocks(body_groups)
+
+        return (template.mobile_text, [template.header_block, template.divider_block, *body_blocks])
+
+    def _build_fields(self, kind: str, id: str, optional: Optional[dict]) -> Tuple[str, List[Any]]:
+        template = get_template(kind, f"{id}")
+
+        body_fields = []
+        if optional is not None:
+            body_fields = template.fields(self._format_optional(optional))
+
+        body_blocks = self._get_body_blocks([body_fields])
+
+        return (template.mobile_text, [template.header_block, template.divider_block, *body_blocks])
+
+    def _build_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[str, List[Any]]:
+        return self._build_fields_groups("training_start", id, optionals)
+
+    def _build_progress(self, id: str, optionals: Optional[Sequence[dict]] = None,
+                        sparklines: Optional[Sequence[Dict[Any, str]]] = None) -> Tuple[str, List[Any]]:
+        return self._build_fields_groups("progress", id, optionals, sparklines)
+
+    def _build_error(self, id: str, optional: dict) -> Tuple[str, List[Any]]:
+        return self._build_fields("error", id, optional)
+
+    def _build_result(self, id: str, optional: dict) -> Tuple[str, List[Any]]:
+        return self._build_fields("result", id, optional)
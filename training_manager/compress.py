@@ -0,0 +1,77 @@
+"compress.py"
+
+try:
+    from typing import Union, Iterable, Iterator
+except ImportError:
+    from typing_extensions import Union, Iterable, Iterator # type: ignore
+
+
+GZIP = "gzip"
+ZSTD = "zstd"
+AUTO = "auto"
+CODECS = (GZIP, ZSTD)
+
+SUFFIXES = {GZIP: ".gz", ZSTD: ".zst"}
+
+# (upper size bound in bytes, gzip level, zstd level): small files get the best ratio,
+# large ones a level that keeps up with the uplink
+LEVELS = (
+    (1 << 20, 9, 19),
+    (64 << 20, 6, 10),
+    (None, 1, 3),
+)
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard # noqa: F401
+    except ImportError:
+        return False
+
+    return True
+
+
+def resolve_codec(codec: str) -> str:
+    if codec == AUTO:
+        return ZSTD if zstd_available() else GZIP
+
+    if codec not in CODECS:
+        raise ValueError(f"`compress` expected one of {CODECS + (AUTO,)} but got `{codec}`")
+
+    if codec == ZSTD and not zstd_available():
+        raise ImportError("zstd compression requires `zstandard`. Install it with `pip3 install zstandard`")
+
+    return codec
+
+
+def pick_level(codec: str, size: int) -> int:
+    for bound, gzip_level, zstd_level in LEVELS:
+        if bound is None or size < bound:
+            return gzip_level if codec == GZIP else zstd_level
+
+    raise AssertionError("unreachable")
+
+
+def iter_compressed(chunks: Iterable[Union[bytes, memoryview]], codec: str, level: int) -> Iterator[bytes]:
+    if codec == GZIP:
+        import zlib
+
+        # wbits=16+MAX_WBITS writes a gzip container with a zero mtime, so the output is deterministic
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    data = compressor.flush()
+    if data:
+        yield data
+
+
+def compressed_length(chunks: Iterable[Union[bytes, memoryview]], codec: str, level: int) -> int:
+    return sum(len(data) for data in iter_compressed(chunks, codec, level))
@@ -0,0 +1,311 @@
+"daemon.py"
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+try:
+    from typing import Tuple, Union, Optional, Sequence, Dict, List, Any
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Sequence, Dict, List, Any # type: ignore
+
+from pathlib import Path
+
+from . import ipc
+from .blocks import HeaderBlock_t, BodyBlock_t
+from .interface import TrainingManager
+from .plot import DEFAULT_WIDTH, DEFAULT_HEIGHT
+from .sender import BLOCK
+from .store import Store, CacheFile, open_store, cache_path, DEFAULT_CHANNEL_CACHE
+
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = "TRAINING_MANAGER_DAEMON_SOCKET"
+TOKEN_ENVS = ("TRAINING_MANAGER_BOT_TOKEN", "SLACK_BOT_TOKEN")
+DEFAULT_TS_STORE = CacheFile("daemon-threads.jsonl")
+RECONNECT_INTERVAL = 1.0
+
+# Operations answered with a reply; everything else is fire-and-forget, like queued mode
+REPLY_OPS = frozenset(("flush", "get_ts", "get_progress_ts"))
+SEND_OPS = frozenset((
+    "send_plain_message", "send_rich_block", "send_file", "send_files",
+    "send_training_start", "send_progress", "send_error", "send_result", "send_plot", "record",
+))
+
+
+def default_socket_path() -> str:
+    return os.environ.get(SOCKET_ENV) or ipc.default_socket_path(f"{os.getuid() if hasattr(os, 'getuid') else 0}-daemon")
+
+
+class NotificationDaemon:
+    def __init__(
+        self,
+        bot_token: str,
+        socket_path: Optional[str] = None,
+        ts_store: Optional[Union[str, Path, CacheFile, Store]] = DEFAULT_TS_STORE,
+        queue_size: int = 1024,
+        backpressure: str = BLOCK,
+        coalesce_progress: bool = True,
+        live_progress: bool = False,
+        record_history: bool = False,
+    ) -> None:
+        self._bot_token = bot_token
+        self.socket_path = socket_path or default_socket_path()
+
+        self._owns_ts_store = not isinstance(ts_store, Store)
+        self._ts_store = open_store(cache_path(ts_store)) if isinstance(ts_store, (str, Path, CacheFile)) else ts_store
+        self._manager_kwargs: Dict[str, Any] = dict(
+            queued=True, queue_size=queue_size, backpressure=backpressure, coalesce_progress=coalesce_progress,
+            live_progress=live_progress, ts_store=self._ts_store, channel_cache=DEFAULT_CHANNEL_CACHE, distributed=False,
+            record_history=record_history,
+        )
+
+        # One manager per DM recipient, all sharing the token's client and rate limiter
+        self._managers: Dict[str, TrainingManager] = {}
+        self._managers_lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._closed = threading.Event()
+
+    def manager(self, user_id: str) -> TrainingManager:
+        with self._managers_lock:
+            manager = self._managers.get(user_id)
+            if manager is None:
+                manager = self._managers[user_id] = TrainingManager(self._bot_token, user_id, **self._manager_kwargs)
+                if len(self._managers) > 1:
+                    manager.client = next(iter(self._managers.values())).client
+
+        return manager
+
+    def serve_forever(self) -> None:
+        self._server = ipc.listen(self.socket_path)
+        logger.info("Listening on %s", self.socket_path)
+
+        try:
+            while not self._closed.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._serve, args=(conn,), name="training_manager-daemon-conn", daemon=True).start()
+        finally:
+            self.close()
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            while True:
+                message = ipc.recv_message(conn)
+                if message is None:
+                    break
+
+                result = self._handle(message)
+                if message.get("op") in REPLY_OPS:
+                    ipc.send_message(conn, {"result": result})
+        except (OSError, ValueError):
+            logger.exception("Dropped a client connection")
+        finally:
+            conn.close()
+
+    def _handle(self, message: Dict[str, Any]) -> Any:
+        op = message.get("op")
+        try:
+            manager = self.manager(message["user_id"])
+            if op == "flush":
+                return manager.flush(message.get("timeout"))
+            elif op == "get_ts":
+                return manager.get_ts(message["id"])
+            elif op == "get_progress_ts":
+                return manager.get_progress_ts(message["id"])
+            elif op in SEND_OPS:
+                return getattr(manager, op)(*message.get("args", ()), **message.get("kwargs", {}))
+        except Exception:
+            logger.exception("Failed to handle %s", op)
+            return None
+
+        logger.warning("Ignored unknown operation %r", op)
+        return None
+
+    def stop(self) -> None:
+        # Safe from a signal handler: wakes accept() and lets serve_forever() do the cleanup
+        self._closed.set()
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        self.stop()
+
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+        with self._managers_lock:
+            managers = list(self._managers.values())
+        for manager in managers:
+            manager.close(timeout)
+
+        if self._owns_ts_store and self._ts_store is not None:
+            self._ts_store.close()
+
+
+class DaemonClient:
+    def __init__(self, user_id: str, socket_path: Optional[str] = None, connect_timeout: float = 1.0) -> None:
+        self.user_id = user_id
+        self.socket_path = socket_path or default_socket_path()
+        self.connect_timeout = connect_timeout
+
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._next_connect_at = 0.0
+
+    def _connect(self) -> bool:
+        if self._sock is not None:
+            return True
+
+        now = time.monotonic()
+        if now < self._next_connect_at:
+            return False
+        try:
+            self._sock = ipc.connect(self.socket_path, self.connect_timeout)
+        except OSError:
+            self._next_connect_at = now + RECONNECT_INTERVAL
+            return False
+
+        return True
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _request(self, message: Dict[str, Any]) -> Tuple[bool, Any]:
+        message["user_id"] = self.user_id
+        data = ipc.encode_message(message)
+
+        with self._lock:
+            if not self._connect():
+                return (False, "daemon_unavailable")
+            try:
+                self._sock.sendall(data)
+                if message["op"] not in REPLY_OPS:
+                    return (True, "")
+                reply = ipc.recv_message(self._sock)
+            except (OSError, ValueError):
+                reply = None
+
+            if reply is None:
+                self._disconnect()
+                return (False, "daemon_unavailable")
+
+        return (True, reply["result"])
+
+    def _send(self, op: str, *args: Any, **kwargs: Any) -> Tuple[bool, str]:
+        return self._request({"op": op, "args": args, "kwargs": kwargs})
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        result, flushed = self._request({"op": "flush", "timeout": timeout})
+        return result and bool(flushed)
+
+    def get_ts(self, id: str) -> Optional[str]:
+        result, ts = self._request({"op": "get_ts", "id": f"{id}"})
+        return ts if result else None
+
+    def get_progress_ts(self, id: str) -> Optional[str]:
+        result, ts = self._request({"op": "get_progress_ts", "id": f"{id}"})
+        return ts if result else None
+
+    def send_plain_message(self, message: str) -> Tuple[bool, str]:
+        return self._send("send_plain_message", message)
+
+    def send_rich_block(self, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]],
+                        ts: Optional[str] = None, reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
+        return self._send("send_rich_block", mobile_text, blocks, ts, reply_broadcast, icon_emoji)
+
+    def send_file(self, path: Union[str, Path], title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                  streaming: Optional[bool] = None, compress: Optional[str] = None, filename: Optional[str] = None) -> Tuple[bool, str]:
+        # The daemon reads the file itself, so only paths (resolved here) can be handed over
+        if not isinstance(path, (str, Path)):
+            raise TypeError(f"`path` expected `str` or `pathlib.Path` but got `{type(path).__name__}`")
+        path = Path(path).resolve()
+        if not path.is_file():
+            raise ValueError(f"Specified `path` is not valid file")
+
+        return self._send("send_file", str(path), title, text, ts, streaming, compress=compress, filename=filename)
+
+    def send_files(self, paths: Sequence[Union[str, Path]], ts: Optional[str] = None,
+                   titles: Optional[Sequence[Optional[str]]] = None, compress: Optional[str] = None) -> List[Tuple[bool, str]]:
+        resolved = [str(Path(path).resolve()) for path in paths]
+        return [self._send("send_files", resolved, ts, titles, compress)] * len(resolved)
+
+    def send_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
+        return self._send("send_training_start", id, optionals)
+
+    def send_progress(self, id: str, optionals: Optional[Sequence[dict]] = None, sparkline: bool = False) -> Tuple[bool, str]:
+        return self._send("send_progress", id, optionals, sparkline=sparkline)
+
+    def send_error(self, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
+        return self._send("send_error", id, optional, reply_broadcast)
+
+    def send_result(self, id: str, optional: dict) -> Tuple[bool, str]:
+        return self._send("send_result", id, optional)
+
+    def record(self, id: str, metrics: Dict[str, Any], step: Optional[float] = None) -> None:
+        self._send("record", id, metrics, step)
+
+    def send_plot(self, id: str, metrics: Optional[Sequence[str]] = None, title: Optional[str] = None,
+                  width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT) -> Tuple[bool, str]:
+        # Drawn by the daemon, from the history it recorded: start it with --record-history (or call record())
+        return self._send("send_plot", id, metrics, title, width, height)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m training_manager.daemon",
+                                     description="Serve training_manager notifications for every process on this node")
+    parser.add_argument("--socket", default=None, help=f"Unix socket path (default: ${SOCKET_ENV} or a per-user path in the temp directory)")
+    parser.add_argument("--bot-token", default=None, help=f"Slack bot token (default: ${' or $'.join(TOKEN_ENVS)})")
+    parser.add_argument("--ts-store", default=None,
+                        help=f"where thread timestamps are kept (.jsonl or .db; default: {DEFAULT_TS_STORE.name} in the cache directory)")
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--no-coalesce-progress", action="store_true", help="post every progress update instead of the latest per run")
+    parser.add_argument("--live-progress", action="store_true", help="edit one progress message per run in place")
+    parser.add_argument("--record-history", action="store_true", help="keep every progress value for send_plot")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    bot_token = args.bot_token or next((os.environ[key] for key in TOKEN_ENVS if os.environ.get(key)), None)
+    if not bot_token:
+        parser.error(f"a bot token is required: pass --bot-token or set {' or '.join(TOKEN_ENVS)}")
+
+    daemon = NotificationDaemon(
+        bot_token, args.socket, args.ts_store or DEFAULT_TS_STORE, queue_size=args.queue_size,
+        coalesce_progress=not args.no_coalesce_progress, live_progress=args.live_progress,
+        record_history=args.record_history,
+    )
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.stop())
+
+    daemon.serve_forever()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
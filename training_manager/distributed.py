@@ -0,0 +1,355 @@
+"distributed.py"
+
+import logging
+import numbers
+import os
+import socket
+import threading
+import time
+import weakref
+
+try:
+    from typing import Tuple, Optional, Dict, List, Any, Callable, NamedTuple, Set
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, List, Any, Callable, NamedTuple, Set # type: ignore
+
+from itertools import zip_longest
+
+from . import ipc
+from .sender import Job
+from .values import RankStats
+
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = "TRAINING_MANAGER_SOCKET"
+RUN_ID_ENV = "TRAINING_MANAGER_RUN_ID"
+# torchrun sets this to "none" when no --rdzv-id is given, so it only names the job after the rendezvous address
+ELASTIC_RUN_ID_ENV = "TORCHELASTIC_RUN_ID"
+
+AGGREGATED_KINDS = frozenset(("progress", "result"))
+FORWARDED_KINDS = frozenset(("error",))
+
+DEFAULT_AGGREGATE_TIMEOUT = 5.0
+CONNECT_TIMEOUT = 1.0
+RECONNECT_INTERVAL = 5.0
+MAX_PENDING_REPORTS = 64
+
+
+class RankInfo(NamedTuple):
+    rank: int
+    local_rank: int
+    world_size: int
+    local_world_size: int
+
+    @property
+    def is_main(self) -> bool:
+        return self.rank == 0
+
+    @classmethod
+    def from_env(cls) -> Optional["RankInfo"]:
+        try:
+            world_size = int(os.environ.get("WORLD_SIZE", "1"))
+            rank = int(os.environ.get("RANK", "0"))
+            local_rank = int(os.environ.get("LOCAL_RANK", str(rank)))
+            local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", str(world_size)))
+        except ValueError:
+            return None
+
+        if world_size <= 1:
+            return None
+
+        return cls(rank, local_rank, world_size, local_world_size)
+
+
+def default_socket_path() -> str:
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+
+    return ipc.default_socket_path(f"{os.getuid() if hasattr(os, 'getuid') else 0}-{run_id_from_env()}")
+
+
+def run_id_from_env() -> str:
+    # Every rank of a job must agree on it, and two jobs on one node must not
+    run_id = os.environ.get(RUN_ID_ENV)
+    if run_id:
+        return run_id
+
+    master_port = os.environ.get("MASTER_PORT")
+    if master_port:
+        return f"{os.environ.get('MASTER_ADDR', 'localhost')}-{master_port}".replace(os.sep, "_")
+
+    run_id = os.environ.get(ELASTIC_RUN_ID_ENV)
+    if run_id and run_id != "none":
+        return run_id
+
+    # Launchers such as torchrun and mpirun start every local rank from the same parent
+    return f"ppid{os.getppid()}"
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def rank_stats(values: List[float]) -> RankStats:
+    return RankStats(sum(values) / len(values), min(values), max(values), len(values))
+
+
+def aggregate_optional(optionals: List[dict]) -> dict:
+    # Rank 0 decides the key order; numeric values become their RankStats, formatted later like any other value,
+    # and anything else is rank 0's
+    keys: Dict[Any, None] = {}
+    for optional in optionals:
+        keys.update(dict.fromkeys(optional))
+
+    aggregated = {}
+    for key in keys:
+        values = [optional[key] for optional in optionals if key in optional]
+        # Values every rank agrees on (step, epoch) are shown as they are
+        if len(values) > 1 and all(is_number(value) for value in values) and min(values) != max(values):
+            aggregated[key] = rank_stats([float(value) for value in values])
+        else:
+            aggregated[key] = values[0]
+
+    return aggregated
+
+
+def aggregate_payloads(payloads: List[List[dict]]) -> List[dict]:
+    return [aggregate_optional([optional for optional in group if optional is not None])
+            for group in zip_longest(*payloads)]
+
+
+def job_payload(job: Job) -> List[dict]:
+    _, optionals = job.args[:2]
+    if job.kind == "progress":
+        return list(optionals or [])
+
+    return [optionals or {}]
+
+
+def with_payload(job: Job, payload: List[dict]) -> Job:
+    id = job.args[0]
+    if job.kind == "progress":
+        return job._replace(args=(id, payload))
+
+    return job._replace(args=(id, payload[0] if payload else {}))
+
+
+class DistributedContext:
+    def __init__(
+        self,
+        info: RankInfo,
+        socket_path: Optional[str] = None,
+        aggregate_timeout: float = DEFAULT_AGGREGATE_TIMEOUT,
+        on_error: Optional[Callable[[int, str, dict, bool], Any]] = None,
+    ) -> None:
+        self.info = info
+        self.socket_path = socket_path or default_socket_path()
+        self.aggregate_timeout = aggregate_timeout
+
+        self._seqs: Dict[Tuple[str, str], int] = {}
+        self._seq_lock = threading.Lock()
+
+        # Rank 0: reports from the other ranks, keyed by (kind, id) then rank then sequence number
+        self._reports: Dict[Tuple[str, str], Dict[int, Dict[int, List[dict]]]] = {}
+        self._latest: Dict[Tuple[str, str], Dict[int, int]] = {}
+        self._peers: Set[int] = set()
+        self._cond = threading.Condition()
+        self._on_error = on_error
+        self._server: Optional[socket.socket] = None
+
+        # Other ranks: a lazily (re)connected socket to rank 0
+        self._sock: Optional[socket.socket] = None
+        self._sock_lock = threading.Lock()
+        self._next_connect_at = 0.0
+
+        self._closed = False
+        if info.is_main:
+            self._listen()
+
+    @classmethod
+    def create(
+        cls,
+        distributed: Optional[bool] = None,
+        aggregate_timeout: float = DEFAULT_AGGREGATE_TIMEOUT,
+        on_error: Optional[Callable[[int, str, dict, bool], Any]] = None,
+    ) -> Optional["DistributedContext"]:
+        if distributed is False:
+            return None
+
+        info = RankInfo.from_env()
+        if info is None:
+            return None
+
+        return cls(info, aggregate_timeout=aggregate_timeout, on_error=on_error)
+
+    def _next_seq(self, kind: str, id: str) -> int:
+        with self._seq_lock:
+            seq = self._seqs[(kind, id)] = self._seqs.get((kind, id), 0) + 1
+
+        return seq
+
+    def route(self, job: Job) -> Optional[Job]:
+        if self.info.is_main:
+            if job.kind in AGGREGATED_KINDS:
+                return job._replace(kwargs={**job.kwargs, "report_seq": self._next_seq(job.kind, f"{job.id}")})
+            return job
+
+        # Other ranks never talk to Slack: reports go to rank 0 and everything else is dropped.
+        # The report is sent by a "forward" job, so tensors in it are read on the sender's thread like any other job
+        if job.kind in AGGREGATED_KINDS:
+            return Job("forward", job.id, ({
+                "type": "report", "rank": self.info.rank, "kind": job.kind, "id": f"{job.id}",
+                "seq": self._next_seq(job.kind, f"{job.id}"), "payload": job_payload(job),
+            },), {})
+        elif job.kind in FORWARDED_KINDS:
+            id, optional, *rest = job.args
+            return Job("forward", job.id, ({
+                "type": "error", "rank": self.info.rank, "id": f"{id}", "optional": optional,
+                "reply_broadcast": rest[0] if rest else True,
+            },), {})
+
+        return None
+
+    def aggregate(self, job: Job) -> Job:
+        seq = job.kwargs.get("report_seq")
+        if seq is None:
+            return job
+
+        kwargs = dict(job.kwargs)
+        del kwargs["report_seq"]
+        job = job._replace(kwargs=kwargs)
+
+        key = (job.kind, f"{job.id}")
+        deadline = time.monotonic() + self.aggregate_timeout
+        with self._cond:
+            # Only connected ranks that have reported this key before are waited for: a rank on another host,
+            # or one that never sends this id, costs nothing
+            while not self._closed:
+                latest = self._latest.get(key, {})
+                missing = [rank for rank, latest_seq in latest.items() if rank in self._peers and latest_seq < seq]
+                left = deadline - time.monotonic()
+                if not missing or left <= 0:
+                    break
+                self._cond.wait(left)
+
+            payloads = [job_payload(job)]
+            for rank, reports in sorted(self._reports.get(key, {}).items()):
+                usable = [report_seq for report_seq in reports if report_seq <= seq]
+                if usable:
+                    payloads.append(reports[max(usable)])
+                for report_seq in usable:
+                    del reports[report_seq]
+
+        if len(payloads) == 1:
+            return job
+
+        return with_payload(job, aggregate_payloads(payloads))
+
+    def forward(self, message: Dict[str, Any]) -> bool:
+        # False when rank 0 could not be reached, as on every rank off rank 0's host
+        with self._sock_lock:
+            if self._sock is None:
+                now = time.monotonic()
+                if now < self._next_connect_at:
+                    return False
+                try:
+                    self._sock = ipc.connect(self.socket_path, CONNECT_TIMEOUT)
+                    ipc.send_message(self._sock, {"type": "hello", "rank": self.info.rank})
+                except OSError:
+                    self._sock = None
+                    self._next_connect_at = now + RECONNECT_INTERVAL
+                    logger.debug("Rank %d could not reach rank 0 at %s", self.info.rank, self.socket_path)
+                    return False
+
+            try:
+                ipc.send_message(self._sock, message)
+            except (OSError, ValueError):
+                self._sock.close()
+                self._sock = None
+                self._next_connect_at = time.monotonic() + RECONNECT_INTERVAL
+                return False
+
+        return True
+
+    def _listen(self) -> None:
+        try:
+            self._server = ipc.listen(self.socket_path)
+        except OSError as e:
+            logger.warning("Could not listen on %s (%s); progress from other ranks will not be aggregated", self.socket_path, e)
+            return
+
+        weakref.finalize(self, _unlink, self.socket_path)
+        threading.Thread(target=self._accept, name="training_manager-rank0", daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="training_manager-rank0-peer", daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        rank = None
+        try:
+            while True:
+                message = ipc.recv_message(conn)
+                if message is None:
+                    break
+
+                if message["type"] == "hello":
+                    rank = message["rank"]
+                    with self._cond:
+                        self._peers.add(rank)
+                elif message["type"] == "report":
+                    self._add_report(message)
+                elif message["type"] == "error" and self._on_error is not None:
+                    self._on_error(message["rank"], message["id"], message["optional"], message["reply_broadcast"])
+        except (OSError, ValueError, KeyError):
+            logger.exception("Dropped a connection from rank %s", rank)
+        finally:
+            conn.close()
+            if rank is not None:
+                with self._cond:
+                    self._peers.discard(rank)
+                    self._cond.notify_all()
+
+    def _add_report(self, message: Dict[str, Any]) -> None:
+        key, rank, seq = (message["kind"], message["id"]), message["rank"], message["seq"]
+        with self._cond:
+            reports = self._reports.setdefault(key, {}).setdefault(rank, {})
+            reports[seq] = message["payload"]
+            # A rank 0 that stopped reporting must not let the other ranks' reports pile up
+            while len(reports) > MAX_PENDING_REPORTS:
+                del reports[min(reports)]
+
+            latest = self._latest.setdefault(key, {})
+            latest[rank] = max(latest.get(rank, 0), seq)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            _unlink(self.socket_path)
+
+        with self._sock_lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,226 @@
+"formatter.py"
+
+import math
+import numbers
+from datetime import timedelta
+
+try:
+    from typing import Tuple, Union, Optional, Dict, List, Any, Callable
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Dict, List, Any, Callable # type: ignore
+
+from .values import Summary, RankStats
+
+
+Format_t = Callable[[Any], str]
+# A named format ("si", "sci", "percent", "duration", optionally with ".<precision>"),
+# a Python format spec (".4f", ",d") or a callable returning the text
+Spec_t = Union[str, Format_t]
+
+DEFAULT_PRECISION = 6
+# Slack's limit for a field's text (blocks.MAX_FIELD_TEXT_LENGTH): long values such as tracebacks are kept whole
+DEFAULT_MAX_VALUE_LENGTH = 2000
+FORMAT_CACHE_SIZE = 1024
+
+# https://api.slack.com/reference/surfaces/formatting#escaping
+MRKDWN_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+SI_PREFIXES = {
+    -24: "y", -21: "z", -18: "a", -15: "f", -12: "p", -9: "n", -6: "µ", -3: "m",
+    0: "", 3: "k", 6: "M", 9: "G", 12: "T", 15: "P", 18: "E", 21: "Z", 24: "Y",
+}
+
+
+def truncate_mrkdwn(text: str, limit: int) -> str:
+    # Never leaves half an entity from escape_mrkdwn (`&am…`) at the end
+    if len(text) <= limit:
+        return text
+
+    text = text[:limit - 1]
+    amp = text.rfind("&", len(text) - 4)
+    if amp != -1 and ";" not in text[amp:]:
+        text = text[:amp]
+
+    return text + "…"
+
+
+def escape_mrkdwn(text: str) -> str:
+    return text.translate(MRKDWN_ESCAPES)
+
+
+class Mrkdwn(str):
+    # A value that is already Slack mrkdwn, such as a `<url|text>` link: shown as it is instead of escaped
+    __slots__ = ()
+
+
+def format_si(value: float, precision: int = 3) -> str:
+    if value == 0 or not math.isfinite(value):
+        return f"{value:.{precision}g}"
+
+    exponent = min(max(math.floor(math.log10(abs(value)) / 3) * 3, -24), 24)
+    text = f"{value / 10 ** exponent:.{precision}g}"
+    # Rounding can carry into the next prefix: 999.96k is 1M, not 1e+03k
+    if abs(float(text)) >= 1000 and exponent < 24:
+        exponent += 3
+        text = f"{value / 10 ** exponent:.{precision}g}"
+
+    return f"{text}{SI_PREFIXES[exponent]}"
+
+
+def format_scientific(value: float, precision: int = 3) -> str:
+    return f"{value:.{precision}e}"
+
+
+def format_percent(value: float, precision: int = 1) -> str:
+    return f"{value:.{precision}%}"
+
+
+def format_duration(seconds: Union[float, timedelta], precision: int = 1) -> str:
+    if isinstance(seconds, timedelta):
+        seconds = seconds.total_seconds()
+    if not math.isfinite(seconds):
+        return f"{seconds}"
+
+    sign, seconds = ("-" if seconds < 0 else ""), abs(seconds)
+    if seconds < 1:
+        return f"{sign}{seconds * 1000:.{precision}f}ms"
+    if seconds < 60:
+        return f"{sign}{seconds:.{precision}f}s"
+
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{sign}{days}d {hours:02d}h {minutes:02d}m"
+    if hours:
+        return f"{sign}{hours}h {minutes:02d}m {secs:02d}s"
+
+    return f"{sign}{minutes}m {secs:02d}s"
+
+
+# name: (function, default precision)
+NAMED_FORMATS: Dict[str, Tuple[Callable[[Any, int], str], int]] = {
+    "si": (format_si, 3),
+    "sci": (format_scientific, 3),
+    "percent": (format_percent, 1),
+    "duration": (format_duration, 1),
+}
+
+
+def compile_spec(spec: Spec_t) -> Format_t:
+    if callable(spec):
+        return spec
+
+    name, _, precision = spec.partition(".")
+    if name in NAMED_FORMATS:
+        function, default = NAMED_FORMATS[name]
+        digits = int(precision) if precision else default
+        return lambda value: function(value, digits)
+
+    # Anything else is a Python format spec; a bad one fails here rather than on every message
+    for sample in (1.5, 1):
+        try:
+            format(sample, spec)
+            break
+        except ValueError:
+            pass
+    else:
+        raise ValueError(f"Invalid format spec `{spec}`: expected one of {sorted(NAMED_FORMATS)} or a Python format spec")
+
+    return lambda value: format(value, spec)
+
+
+def _fallback(function: Format_t) -> Format_t:
+    # A spec that does not fit the value (",d" on a float) shows the value as it is instead of failing the message
+    def format_or_str(value: Any) -> str:
+        try:
+            return function(value)
+        except (TypeError, ValueError):
+            return f"{value}"
+
+    return format_or_str
+
+
+class ValueFormatter:
+    def __init__(
+        self,
+        formats: Optional[Dict[Any, Spec_t]] = None,
+        precision: int = DEFAULT_PRECISION,
+        max_length: Optional[int] = DEFAULT_MAX_VALUE_LENGTH,
+        escape: bool = True,
+    ) -> None:
+        # Specs are checked up front, and keyed by their string form so `1` and `"1"` name the same key
+        self._specs: Dict[str, Format_t] = {f"{key}": compile_spec(spec) for key, spec in (formats or {}).items()}
+        self._default_number = lambda value: f"{value:.{precision}g}"
+        self.max_length = max_length
+        self.escape = escape
+
+        # (key, type) -> compiled format; looked up once per value instead of re-resolving the rules
+        self._compiled: Dict[Tuple[Any, type], Format_t] = {}
+
+    def _compile(self, key: Any, kind: type) -> Format_t:
+        if issubclass(kind, Mrkdwn):
+            return Mrkdwn
+        if issubclass(kind, str):
+            return str
+        if issubclass(kind, bool) or kind is type(None):
+            return str
+
+        spec = self._specs.get(f"{key}")
+        if issubclass(kind, timedelta):
+            return _fallback(spec or format_duration)
+        if issubclass(kind, numbers.Integral):
+            return str if spec is None else _fallback(spec)
+        if issubclass(kind, numbers.Real):
+            return _fallback(spec or self._default_number)
+        if issubclass(kind, Summary):
+            number = _fallback(spec or self._default_number)
+            return lambda s: (f"{number(s.mean)} ± {number(s.std)} (min {number(s.min)} / max {number(s.max)}, "
+                              f"{'×'.join(str(n) for n in s.shape)})")
+        if issubclass(kind, RankStats):
+            number = _fallback(spec or self._default_number)
+            return lambda s: f"{number(s.mean)} (min {number(s.min)} / max {number(s.max)}, n={s.n})"
+        if issubclass(kind, (list, tuple)):
+            brackets = "[]" if issubclass(kind, list) else "()"
+            return lambda values: self._format_sequence(key, values, brackets)
+
+        return str
+
+    def _text(self, key: Any, value: Any) -> str:
+        compiled = self._compiled.get((key, type(value)))
+        if compiled is None:
+            compiled = self._compile(key, type(value))
+            if len(self._compiled) < FORMAT_CACHE_SIZE:
+                self._compiled[(key, type(value))] = compiled
+
+        return compiled(value)
+
+    def _format_sequence(self, key: Any, values: Any, brackets: str) -> str:
+        # Elements use the key's format; formatting stops once the text is past the length limit
+        parts: List[str] = []
+        length = 2
+        for value in values:
+            if self.max_length is not None and length > self.max_length:
+                parts.append("…")
+                break
+            part = self._text(key, value)
+            parts.append(part)
+            length += len(part) + 2
+
+        return f"{brackets[0]}{', '.join(parts)}{brackets[1]}"
+
+    def format_value(self, key: Any, value: Any) -> str:
+        text = self._text(key, value)
+        # Escaped first, so the limit applies to the text that is actually sent
+        if self.escape and not isinstance(text, Mrkdwn):
+            text = text.translate(MRKDWN_ESCAPES)
+        if self.max_length is not None and len(text) > self.max_length:
+            text = truncate_mrkdwn(text, self.max_length)
+
+        return text
+
+    def format_optional(self, optional: dict) -> Dict[Any, str]:
+        return {key: self.format_value(key, value) for key, value in optional.items()}
+
+
+DEFAULT_FORMATTER = ValueFormatter()
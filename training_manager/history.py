@@ -0,0 +1,186 @@
+"history.py"
+
+import math
+import numbers
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+try:
+    from typing import Tuple, Optional, Dict, List, Any, Sequence, Iterable, Deque
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, List, Any, Sequence, Iterable, Deque # type: ignore
+
+from .values import is_array_like, detach, to_float
+
+
+STEP_KEYS = ("step", "global_step", "iteration", "iter")
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+DEFAULT_SPARKLINE_LENGTH = 24
+MAX_SPARKLINE_RUNS = 64
+MAX_UNRESOLVED = 1024
+
+
+class Series:
+    def __init__(self) -> None:
+        # Two flat float64 buffers: 16 bytes per point, and zero-copy to NumPy via the buffer protocol
+        self.steps = array("d")
+        self.values = array("d")
+        # Tensors from the training loop, read later on the sender's thread instead of at record time
+        self.unresolved: List[Tuple[float, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.values) + len(self.unresolved)
+
+    def append(self, step: float, value: Any) -> None:
+        # Once a tensor is waiting, later points queue behind it so the order is kept
+        if self.unresolved or not is_real(value):
+            self.unresolved.append((step, value))
+        else:
+            self.steps.append(step)
+            self.values.append(float(value))
+
+
+class MetricHistory:
+    def __init__(self) -> None:
+        self._series: Dict[Tuple[str, str], Series] = {}
+        self._lock = threading.Lock()
+        self._resolve_lock = threading.Lock()
+
+    def record(self, id: str, metrics: Dict[Any, Any], step: Optional[float] = None) -> None:
+        if step is None:
+            step = next((metrics[key] for key in STEP_KEYS if is_real(metrics.get(key))), None)
+
+        backlog = 0
+        with self._lock:
+            for key, value in metrics.items():
+                if key in STEP_KEYS or not (is_real(value) or is_array_like(value)):
+                    continue
+                series = self._series.get((id, f"{key}"))
+                if series is None:
+                    series = self._series[(id, f"{key}")] = Series()
+                series.append(len(series) if step is None else float(step), value if is_real(value) else detach(value))
+                backlog = max(backlog, len(series.unresolved))
+
+        # Bounds how many tensors are held alive: one device sync per MAX_UNRESOLVED points
+        if backlog >= MAX_UNRESOLVED:
+            self.resolve(id)
+
+    def resolve(self, id: Optional[str] = None) -> None:
+        with self._resolve_lock:
+            with self._lock:
+                batches = [(series, series.unresolved[:]) for (run, _), series in self._series.items()
+                           if series.unresolved and (id is None or run == id)]
+
+            # Read outside the lock: a device tensor waits for the device, and recording must not wait with it
+            points = [(series, len(batch), [(step, to_float(value)) for step, value in batch]) for series, batch in batches]
+
+            with self._lock:
+                for series, count, converted in points:
+                    del series.unresolved[:count]
+                    for step, value in converted:
+                        if value is not None:
+                            series.steps.append(step)
+                            series.values.append(value)
+
+    def metrics(self, id: str) -> List[str]:
+        with self._lock:
+            return [key for run, key in self._series if run == id]
+
+    def snapshot(self, id: str, metrics: Optional[Sequence[str]] = None) -> List[Tuple[str, array, array]]:
+        self.resolve(id)
+
+        # Copies are taken under the lock so recording can go on while the copies are downsampled
+        with self._lock:
+            keys = [key for run, key in self._series if run == id] if metrics is None else [f"{key}" for key in metrics]
+            return [(key, array("d", self._series[(id, key)].steps), array("d", self._series[(id, key)].values))
+                    for key in keys if (id, key) in self._series]
+
+    def clear(self, id: Optional[str] = None) -> None:
+        with self._lock:
+            if id is None:
+                self._series.clear()
+            else:
+                for key in [key for key in self._series if key[0] == id]:
+                    del self._series[key]
+
+
+class RecentValues:
+    # The last `length` values of each metric, for the `max_runs` most recently updated runs
+    def __init__(self, length: int = DEFAULT_SPARKLINE_LENGTH, max_runs: int = MAX_SPARKLINE_RUNS) -> None:
+        self.length = length
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, Deque[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, id: str, metrics: Dict[Any, Any]) -> None:
+        with self._lock:
+            run = self._runs.get(id)
+            if run is None:
+                run = self._runs[id] = {}
+                if len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            else:
+                self._runs.move_to_end(id)
+
+            for key, value in metrics.items():
+                if key in STEP_KEYS or not (is_real(value) or is_array_like(value)):
+                    continue
+                values = run.get(f"{key}")
+                if values is None:
+                    values = run[f"{key}"] = deque(maxlen=self.length)
+                values.append(value if is_real(value) else detach(value))
+
+    def sparklines(self, id: str, keys: Iterable[Any]) -> Dict[Any, str]:
+        # The trend of each key's recent values; keys with nothing recorded are left out
+        with self._lock:
+            run = self._runs.get(id) or {}
+            windows = {key: list(run[f"{key}"]) for key in keys if f"{key}" in run}
+
+        # Tensors are read here, outside the lock, on the thread that builds the message
+        read = {key: [value if is_real(value) else _nan_if_none(to_float(value)) for value in window] for key, window in windows.items()}
+        lines = {key: sparkline(values) for key, values in read.items()}
+
+        # and written back in place of the tensors, so each one is read only once
+        pending = [key for key, window in windows.items() if not all(map(is_real, window))]
+        if pending:
+            with self._lock:
+                for key in pending:
+                    window, values = windows[key], run.get(f"{key}")
+                    if not values:
+                        continue
+                    # Values recorded meanwhile have pushed the oldest ones out of the window
+                    shift = next((j for j, value in enumerate(window) if value is values[0]), len(window))
+                    for i, j in enumerate(range(shift, len(window))):
+                        if values[i] is window[j] and not is_real(window[j]):
+                            values[i] = read[key][j]
+
+        return {key: line for key, line in lines.items() if line}
+
+    def clear(self, id: Optional[str] = None) -> None:
+        with self._lock:
+            if id is None:
+                self._runs.clear()
+            else:
+                self._runs.pop(id, None)
+
+
+def sparkline(values: Sequence[float]) -> str:
+    # One bar per value, scaled between the window's min and max; NaN and inf are left blank
+    finite = [value for value in values if math.isfinite(value)]
+    if not finite:
+        return ""
+
+    lo, hi = min(finite), max(finite)
+    scale = (len(SPARK_BARS) - 1) / (hi - lo) if hi > lo else 0.0
+    bars = SPARK_BARS
+
+    return "".join(bars[int((value - lo) * scale + 0.5)] if math.isfinite(value) else " " for value in values)
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def is_real(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
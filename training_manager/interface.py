@@ -1,123 +1,406 @@
 "interface.py"
 
+import json
+import logging
 import os
+import threading
+import time
 
 try:
-    from typing import Tuple, Union, Optional, Sequence, Dict, List, Any
+    from typing import Tuple, Union, Optional, Sequence, Dict, List, Any, Iterable, TYPE_CHECKING
 except ImportError:
-    from typing_extensions import Tuple, Union, Optional, Sequence, Dict, List, Any # type: ignore
+    from typing_extensions import Tuple, Union, Optional, Sequence, Dict, List, Any, Iterable, TYPE_CHECKING # type: ignore
 
 from datetime import datetime, timedelta, timezone
+from itertools import zip_longest
 from pathlib import Path
 
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from slack_sdk.web.slack_response import SlackResponse
+from .blocks import BlockBuilder, HeaderBlock_t, BodyBlock_t, ComposedBlock_t
+from .distributed import DistributedContext, DEFAULT_AGGREGATE_TIMEOUT
+from .formatter import ValueFormatter, Spec_t, DEFAULT_MAX_VALUE_LENGTH
+from .compress import SUFFIXES, resolve_codec, pick_level, iter_compressed, compressed_length
+from .history import MetricHistory, RecentValues, DEFAULT_SPARKLINE_LENGTH
+from .plot import DEFAULT_WIDTH, DEFAULT_HEIGHT, require_plotting, lttb, get_renderer
+from .ratelimit import RateLimiter, get_retry_after
+from .sender import BackgroundSender, Job, BLOCK
+from .retry import RetryPolicy, DEFAULT_RETRY, is_network_error, error_code
+from .spool import Spool, DEFAULT_REPLAY_INTERVAL
+from .store import Store, CacheFile, TsHolder, ChannelCache, UploadCache, resolve_store, DEFAULT_CHANNEL_CACHE, DEFAULT_CHANNEL_CACHE_TTL
+from .transport import Transport_t, POOLED, DEFAULT_POOL_SIZE, DEFAULT_HTTP_TIMEOUT, resolve_transport, create_web_client
+from .upload import Progress_t, FileLike_t, UploadSource, UploadTimeout, hash_source, stream_upload
+from .utils import hash_token, slack_api_error, slack_error_code, RECIPIENT_ERRORS, response_status, response_headers
+from .values import detach_job, resolve_job, resolve_optional
 
+if TYPE_CHECKING:
+    from slack_sdk import WebClient
+    from slack_sdk.web.slack_response import SlackResponse
 
-HeaderBlock_t = Dict[str, Union[str, Dict[str, Union[str, bool]]]]
-BodyBlock_t = Dict[str, Union[str, List[Dict[str, str]]]]
-ComposedBlock_t = List[Union[HeaderBlock_t, BodyBlock_t]]
 
-class TrainingManager:
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_WORKERS = 4
+
+class TrainingManager(BlockBuilder):
     def __init__(
         self,
         bot_token: str,
         user_id: str,
+        queued: bool = False,
+        queue_size: int = 1024,
+        backpressure: str = BLOCK,
+        coalesce_progress: bool = False,
+        live_progress: bool = False,
+        ts_store: Optional[Union[str, Path, Store]] = None,
+        channel_cache: Optional[Union[str, Path, CacheFile, Store]] = DEFAULT_CHANNEL_CACHE,
+        channel_cache_ttl: float = DEFAULT_CHANNEL_CACHE_TTL,
+        rate_limit: bool = True,
+        max_ratelimit_retries: int = 10,
+        retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+        streaming_upload_threshold: Optional[int] = 16 << 20,
+        upload_timeout: Optional[float] = None,
+        upload_cache: Optional[Union[str, Path, Store]] = None,
+        distributed: Optional[bool] = None,
+        aggregate_timeout: float = DEFAULT_AGGREGATE_TIMEOUT,
+        transport: Transport_t = POOLED,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        http_timeout: Optional[float] = DEFAULT_HTTP_TIMEOUT,
+        spool: Optional[Union[str, Path]] = None,
+        spool_replay_interval: float = DEFAULT_REPLAY_INTERVAL,
+        record_history: bool = False,
+        sparkline_length: int = DEFAULT_SPARKLINE_LENGTH,
+        formats: Optional[Dict[Any, Spec_t]] = None,
+        max_value_length: Optional[int] = DEFAULT_MAX_VALUE_LENGTH,
     ) -> None:
-        self.client = WebClient(token=bot_token)
+        if coalesce_progress and not queued:
+            raise ValueError("`coalesce_progress` requires `queued=True`: only updates still waiting in the queue can be merged")
 
-        self.user_id = user_id
-        self.channel_id = self._get_channel_id()
+        self._bot_token = bot_token
+        self._client: Optional["WebClient"] = None
+        # Keep-alive connections are shared by every manager in the process with the same pool settings
+        self._pool = resolve_transport(transport, pool_size, http_timeout)
+
+        self._rate_limiter: Optional[RateLimiter] = RateLimiter.for_token(bot_token) if rate_limit else None
+        self.max_ratelimit_retries = max_ratelimit_retries
+        self.retry = retry
 
-        self._ts_holder: Dict[str, str] = {}
+        self.streaming_upload_threshold = streaming_upload_threshold
+        self.upload_timeout = upload_timeout
+        self._upload_cache = UploadCache.open(upload_cache)
+
+        self.user_id = user_id
+        self._token_hash = hash_token(bot_token)
+
+        # Resolved on first send, which runs on the worker thread in queued mode
+        self._channel_id: Optional[str] = None
+        self._channel_lock = threading.Lock()
+        self._channel_cache = ChannelCache.open(channel_cache, channel_cache_ttl)
+
+        # Threads are keyed by token and user: the DM channel follows from both, so no lookup is needed to resume
+        self._ts_store, self._owns_ts_store = resolve_store(ts_store)
+        namespace = f"{self._token_hash}:{user_id}"
+        self._ts_holder = TsHolder(self._ts_store, f"{namespace}:thread")
+
+        self.live_progress = live_progress
+        self._progress_ts_holder = TsHolder(self._ts_store, f"{namespace}:progress")
+
+        # Under a multi-process launcher (WORLD_SIZE > 1) only rank 0 posts; other ranks report to it
+        self._distributed = DistributedContext.create(distributed, aggregate_timeout, on_error=self._send_forwarded_error)
+
+        # Messages Slack could not be reached for are logged here and delivered in order once it can
+        self._spool: Optional[Spool] = None
+        if spool is not None:
+            # Recorded so that a replay from the CLI keeps follow-ups in their threads; a Store given as an instance
+            # is recorded by its file, when it has one
+            ts_store_path = ts_store if isinstance(ts_store, (str, Path)) else getattr(ts_store, "path", None)
+            self._spool = Spool.create(spool, self._token_hash, user_id, ts_store_path, replay_interval=spool_replay_interval)
+
+        # Numeric progress values, kept for send_plot
+        self.record_history = record_history
+        self._history = MetricHistory()
+        # Recent values behind `send_progress(..., sparkline=True)`
+        self._recent = RecentValues(sparkline_length)
+
+        # Per-key format specs for optionals values, e.g. {"lr": "sci", "acc": "percent", "elapsed": "duration"}
+        self.formatter = ValueFormatter(formats, max_length=max_value_length)
+
+        self._sender: Optional[BackgroundSender] = None
+        if queued:
+            self._sender = BackgroundSender(self._dispatch, maxsize=queue_size, backpressure=backpressure,
+                                            merge=self._merge_jobs, coalesce_kinds=("progress",) if coalesce_progress else ())
+
+    @property
+    def client(self) -> "WebClient":
+        if self._client is None:
+            self._client = create_web_client(self._bot_token, self._pool)
+
+        return self._client
+
+    @client.setter
+    def client(self, client: "WebClient") -> None:
+        self._client = client
+
+    def _call_api(self, method: str, scope: Optional[str] = None, **kwargs: Any) -> "SlackResponse":
+        retries = attempt = 0
+        started = time.monotonic()
+        while True:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(method, scope)
+
+            try:
+                api_method = getattr(self.client, method.replace(".", "_"), None)
+                if api_method is None:
+                    # Methods newer than the pinned slack_sdk have no wrapper yet
+                    return self.client.api_call(method, data={k: v for k, v in kwargs.items() if v is not None})
+                return api_method(**kwargs)
+            except slack_api_error() as e:
+                if response_status(e.response) == 429 and self._rate_limiter is not None and retries < self.max_ratelimit_retries:
+                    self._rate_limiter.penalize(method, get_retry_after(response_headers(e.response)), scope)
+                    retries += 1
+                    continue
+                error: BaseException = e
+            except Exception as e:
+                error = e
+
+            # Transient failures (5xx, resets, timeouts) back off with jitter; anything else is raised as is
+            delay = None if self.retry is None else self.retry.next_delay(attempt, started, error)
+            if delay is None:
+                raise error
+            if response_status(getattr(error, "response", None)) == 429:
+                delay = max(delay, get_retry_after(response_headers(error.response)))
+            logger.warning("%s failed (%s); retrying in %.1f s", method, error, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    @property
+    def channel_id(self) -> str:
+        if self._channel_id is None:
+            with self._channel_lock:
+                if self._channel_id is None:
+                    self._channel_id = self._get_channel_id()
+
+        return self._channel_id
 
     def _get_channel_id(self) -> str:
+        if self._channel_cache is not None:
+            channel_id = self._channel_cache.get(self._token_hash, self.user_id)
+            if channel_id is not None:
+                return channel_id
+
         try:
-            response: SlackResponse = self.client.conversations_open(users=self.user_id)
-        except SlackApiError:
-            raise ValueError(f"Cannot find channel name. Make sure `user_id` is valid") from None
-
-        return response["channel"]["id"]
-
-    def _get_header_block(self, text: str) -> HeaderBlock_t:
-        block: HeaderBlock_t = {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": text,
-                "emoji": True
-            }
-        }
-
-        return block
-
-    def _get_body_field(self, text: str) -> Dict[str, str]:
-        return {"type": "mrkdwn", "text": text}
-
-    def _get_body_block(self, fields: Sequence[Dict[str, str]]) -> BodyBlock_t:
-        block: BodyBlock_t = {
-            "type": "section",
-            "fields": fields
-        }
-
-        return block
-
-    def _get_body_blocks(self, fields_group: Sequence[Sequence[Dict[str, str]]]) -> BodyBlock_t:
-        blocks = []
-        for i, fields in enumerate(fields_group):
-            if i != 0:
-                blocks.append(self._get_divider_block())
-            block: BodyBlock_t = {
-                "type": "section",
-                "fields": fields
-            }
-            blocks.append(block)
-
-        return blocks
-
-    def _get_footer_block(self, text: str) -> BodyBlock_t:
-        block: BodyBlock_t = {
-            "type": "section",
-            "fields": [
-                {
-                    "type": "mrkdwn",
-                    "text": text
-                },
-            ]
-        }
-
-        return block
-    
-    def _get_divider_block(self) -> Dict[str, str]:
-        return {"type": "divider"}
-
-    def _compose_blocks(self, blocks: Sequence[Any]) -> ComposedBlock_t:
-        composed_block: ComposedBlock_t = []
-        for block in blocks:
-            if block is not None:
-                composed_block.append(block)
-        
-        return composed_block
+            response: "SlackResponse" = self._call_api("conversations.open", users=self.user_id)
+        except slack_api_error() as e:
+            if slack_error_code(e) in RECIPIENT_ERRORS:
+                raise ValueError(f"Cannot find channel name. Make sure `user_id` is valid") from None
+            # Slack being unavailable is not the caller's mistake: _deliver reports it as `(False, code)`
+            raise
+
+        channel_id = response["channel"]["id"]
+        if self._channel_cache is not None:
+            self._channel_cache.set(self._token_hash, self.user_id, channel_id)
+
+        return channel_id
 
     def get_ts(self, id: str) -> Optional[str]:
         return self._ts_holder.get(id)
-    
+
+    def get_progress_ts(self, id: str) -> Optional[str]:
+        return self._progress_ts_holder.get(id)
+
+    @property
+    def rank(self) -> int:
+        return 0 if self._distributed is None else self._distributed.info.rank
+
+    @property
+    def spooled(self) -> int:
+        return 0 if self._spool is None else len(self._spool.pending)
+
+    def replay_spool(self) -> bool:
+        if self._spool is None:
+            return True
+
+        return self._spool.replay(self._deliver)
+
+    @property
+    def queued(self) -> bool:
+        return self._sender is not None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        flushed = True if self._sender is None else self._sender.flush(timeout)
+        if self._spool is not None:
+            self._spool.sync()
+        self._ts_store.sync()
+
+        return flushed
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        flushed = True if self._sender is None else self._sender.close(timeout)
+        if self._distributed is not None:
+            self._distributed.close()
+        if self._spool is not None:
+            if self._spool.pending:
+                self._spool.replay(self._deliver)
+            self._spool.close()
+        if self._owns_ts_store:
+            self._ts_store.close()
+        else:
+            self._ts_store.sync()
+
+        return flushed
+
+    def _submit(self, kind: str, id: Optional[str], *args: Any, **kwargs: Any) -> Tuple[bool, str]:
+        # Tensors are only detached here; reading them (a device sync) and formatting happen in _dispatch
+        job = detach_job(Job(kind, id, args, kwargs))
+        if self._distributed is not None:
+            job = self._distributed.route(job)
+            if job is None:
+                return (True, "")
+
+        if self._sender is None:
+            return self._dispatch(job)
+
+        return self._sender.submit(job)
+
+    def _dispatch(self, job: Job) -> Tuple[bool, str]:
+        job = resolve_job(job)
+
+        if self._distributed is not None:
+            job = self._distributed.aggregate(job)
+
+        if self._spool is not None:
+            return self._spool.dispatch(job, self._deliver)
+
+        return self._deliver(job)
+
+    def _deliver(self, job: Job) -> Any:
+        try:
+            return getattr(self, f"_send_{job.kind}")(*job.args, **job.kwargs)
+        except slack_api_error() as e:
+            # The DM channel is looked up on the first send; Slack failing there is reported like any other send
+            logger.error("Failed to send %s: %s", job.kind, e)
+            result = (False, slack_error_code(e))
+        except Exception as e:
+            # Out of retries on a network failure: report it like a Slack error instead of killing the caller
+            if not is_network_error(e):
+                raise
+            logger.error("Failed to send %s: %s", job.kind, e)
+            result = (False, error_code(e))
+
+        # send_files reports one result per file
+        return [result] * len(job.args[0]) if job.kind == "files" else result
+
+    def _merge_jobs(self, pending: Job, job: Job) -> Job:
+        id, pending_optionals = pending.args
+        _, optionals = job.args
+
+        merged = [{**old, **new} for old, new in zip_longest(pending_optionals or [], optionals or [], fillvalue={})]
+
+        return Job(job.kind, job.id, (id, merged), job.kwargs)
+
     def send_plain_message(self, message: str) -> Tuple[bool, str]:
+        return self._submit("plain_message", None, message)
+
+    def send_rich_block(self, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]], 
+                        ts: Optional[str] = None, reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
+        return self._submit("rich_block", None, mobile_text, blocks, ts, reply_broadcast, icon_emoji)
+
+    def send_file(self, path: FileLike_t, title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                  streaming: Optional[bool] = None, on_progress: Optional[Progress_t] = None,
+                  compress: Optional[str] = None, filename: Optional[str] = None) -> Tuple[bool, str]:
+        source = UploadSource.create(path, filename)
+        if self._sender is not None:
+            # The worker reads the source later; a file object may be closed and a buffer reused by then
+            source = source.snapshot()
+
+        if compress is not None:
+            compress = resolve_codec(compress)
+
+        return self._submit("file", None, source, title, text, ts, streaming, on_progress, compress)
+
+    def send_files(self, paths: Sequence[Union[FileLike_t, Tuple[FileLike_t, str]]], ts: Optional[str] = None,
+                   titles: Optional[Sequence[Optional[str]]] = None, compress: Optional[str] = None,
+                   max_workers: int = DEFAULT_UPLOAD_WORKERS) -> List[Tuple[bool, str]]:
+        sources = [UploadSource.create(*path) if isinstance(path, tuple) else UploadSource.create(path) for path in paths]
+        if self._sender is not None:
+            sources = [source.snapshot() for source in sources]
+        if titles is None:
+            titles = [None] * len(sources)
+        elif len(titles) != len(sources):
+            raise ValueError(f"`titles` expected {len(sources)} entries but got {len(titles)}")
+
+        if compress is not None:
+            compress = resolve_codec(compress)
+
+        if not sources:
+            return []
+
+        results = self._submit("files", None, sources, list(titles), ts, compress, max_workers)
+        if isinstance(results, tuple):
+            # Queued, or skipped on a non-zero rank: there is no per-file outcome yet
+            return [results] * len(sources)
+
+        return results
+
+    def record(self, id: str, metrics: Dict[str, Any], step: Optional[float] = None) -> None:
+        self._history.record(f"{id}", metrics, step)
+
+    def send_plot(self, id: str, metrics: Optional[Sequence[str]] = None, title: Optional[str] = None,
+                  width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT) -> Tuple[bool, str]:
+        require_plotting()
+
+        return self._submit("plot", id, id, metrics, title, width, height)
+
+    def send_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
+        return self._submit("training_start", id, id, optionals)
+
+    def send_progress(self, id: str, optionals: Optional[Sequence[dict]] = None, sparkline: bool = False) -> Tuple[bool, str]:
+        # Recorded before queueing, so coalesced updates still leave every point in the history
+        if optionals is not None:
+            for optional in optionals:
+                if self.record_history:
+                    self._history.record(f"{id}", optional)
+                if sparkline:
+                    self._recent.record(f"{id}", optional)
+
+        return self._submit("progress", id, id, optionals, sparkline=sparkline)
+
+    def send_error(self, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
+        return self._submit("error", id, id, optional, reply_broadcast)
+
+    def send_result(self, id: str, optional: dict) -> Tuple[bool, str]:
+        return self._submit("result", id, id, optional)
+
+    def _send_forwarded_error(self, rank: int, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
+        return self.send_error(id, {"rank": rank, **optional}, reply_broadcast)
+
+    def _send_forward(self, message: Dict[str, Any]) -> Tuple[bool, str]:
+        # Non-zero ranks: a report or error on its way to rank 0
+        if self._distributed.forward(message) or message["type"] != "error":
+            return (True, "")
+
+        # A crash must reach Slack even when rank 0 is on another host: this rank posts it itself
+        logger.warning("Rank %d could not forward an error to rank 0; sending it directly", message["rank"])
+        optional = resolve_optional({"rank": message["rank"], **(message["optional"] or {})})
+        return self._send_error(message["id"], optional, message["reply_broadcast"])
+
+    def _send_plain_message(self, message: str) -> Tuple[bool, str]:
         try:
-            response = self.client.chat_postMessage(
+            response = self._call_api(
+                "chat.postMessage",
+                self.channel_id,
                 channel=self.channel_id,
                 text=message
             )
-        except SlackApiError as e:
-            return (False, e.response["error"])
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
 
         return (True, response["ts"])
 
-    def send_rich_block(self, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]], 
-                        ts: Optional[str] = None, reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
+    def _send_rich_block(self, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]], 
+                         ts: Optional[str] = None, reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
         try:
-            response = self.client.chat_postMessage(
+            response = self._call_api(
+                "chat.postMessage",
+                self.channel_id,
                 channel=self.channel_id,
                 text=mobile_text,
                 blocks=self._compose_blocks(blocks),
@@ -125,140 +408,309 @@ class TrainingManager:
                 reply_broadcast=reply_broadcast,
                 icon_emoji=icon_emoji
             )
-        except SlackApiError as e:
-            return (False, e.response["error"])
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
 
         return (True, response["ts"])
 
-    def send_file(self, path: Union[str, Path], title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None) -> Tuple[bool, str]:
-        if isinstance(path, str):
-            path = Path(path)
-        elif isinstance(path, Path):
-            pass
-        else:
-            raise TypeError(f"`path` expected `str` or `pathlib.Path` but got `{type(path).__name__}`")
-
-        if not path.is_file():
-            raise ValueError(f"Specified `path` is not valid file")
-
+    def _update_rich_block(self, ts: str, mobile_text: str, blocks: Sequence[Union[Dict[str, str], Optional[BodyBlock_t], Optional[HeaderBlock_t]]]) -> Tuple[bool, str]:
         try:
-            response = self.client.files_upload(
-                file=str(path),
-                channels=self.channel_id,
-                title=title,
-                initial_comment=text,
-                thread_ts=ts
+            response = self._call_api(
+                "chat.update",
+                self.channel_id,
+                channel=self.channel_id,
+                ts=ts,
+                text=mobile_text,
+                blocks=self._compose_blocks(blocks)
             )
-        except SlackApiError as e:
-            return (False, e.response["error"])
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
 
         return (True, response["ts"])
 
-    def send_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
-        header_block = self._get_header_block(f"学習開始 --- {id}")
-        mobile_text = f"{id}の学習を開始しました"
+    def _send_file(self, source: UploadSource, title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                   streaming: Optional[bool] = None, on_progress: Optional[Progress_t] = None,
+                   compress: Optional[str] = None) -> Tuple[bool, str]:
+        if self._upload_cache is None:
+            return self._upload_file(source, title, text, ts, streaming, on_progress, compress)
 
-        divider_block = self._get_divider_block()
+        digest = hash_source(source)
+        result, file_id_or_error = self._share_cached_upload(digest, compress, source.filename, title, text, ts)
+        if result or file_id_or_error != "cache_miss":
+            return (result, file_id_or_error)
 
-        body_groups = []
-        if optionals is not None:
-            for optional in optionals:
-                body_fields = []
-                for i, (key, value) in enumerate(optional.items()):
-                    if i > 9: break
-                    body_fields.append(self._get_body_field(f"*{key}:* \n{value}"))
-                body_groups.append(body_fields)
+        result, file_id_or_error = self._upload_file(source, title, text, ts, streaming, on_progress, compress)
+        if result:
+            self._upload_cache.set(self._token_hash, self.user_id, digest, compress, file_id_or_error)
 
-        body_blocks = self._get_body_blocks(body_groups)
+        return (result, file_id_or_error)
 
-        ts = self._ts_holder.get(f"{id}")
+    def _share_cached_upload(self, digest: str, compress: Optional[str], filename: str,
+                             title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None) -> Tuple[bool, str]:
+        entry = self._lookup_cached_upload(digest, compress)
+        if entry is None:
+            return (False, "cache_miss")
 
-        result, ts_or_error = self.send_rich_block(mobile_text, [header_block, divider_block, *body_blocks], ts)
+        return self._post_cached_upload(entry["file_id"], entry["permalink"], title or filename, text, ts)
 
-        if not result:
-            return (False, ts_or_error)
+    def _lookup_cached_upload(self, digest: str, compress: Optional[str]) -> Optional[Dict[str, Any]]:
+        entry = self._upload_cache.get(self._token_hash, self.user_id, digest, compress)
+        if entry is None:
+            return None
 
-        if ts is None:
-            self._ts_holder[f"{id}"] = ts_or_error
+        # files.info also tells us whether the earlier upload still exists
+        try:
+            response = self._call_api("files.info", file=entry["file_id"])
+        except slack_api_error():
+            self._upload_cache.delete(self._token_hash, self.user_id, digest, compress)
+            return None
 
-        return (True, "")
+        permalink = response["file"]["permalink"]
+        if permalink != entry.get("permalink"):
+            self._upload_cache.set(self._token_hash, self.user_id, digest, compress, entry["file_id"], permalink)
 
-    def send_progress(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
-        header_block = self._get_header_block(f"途中経過 --- {id}")
-        mobile_text = f"{id}の途中経過です"
+        return {"file_id": entry["file_id"], "permalink": permalink}
 
-        divider_block = self._get_divider_block()
+    def _post_cached_upload(self, file_id: str, permalink: str, title: str,
+                            text: Optional[str] = None, ts: Optional[str] = None) -> Tuple[bool, str]:
+        message = f"<{permalink}|{title}>"
+        if text:
+            message = f"{text}\n{message}"
 
-        body_groups = []
-        if optionals is not None:
-            for optional in optionals:
-                body_fields = []
-                for i, (key, value) in enumerate(optional.items()):
-                    if i > 9: break
-                    body_fields.append(self._get_body_field(f"*{key}:* \n{value}"))
-                body_groups.append(body_fields)
-
-        body_blocks = self._get_body_blocks(body_groups)
+        try:
+            self._call_api(
+                "chat.postMessage",
+                self.channel_id,
+                channel=self.channel_id,
+                text=message,
+                thread_ts=ts
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+
+        return (True, file_id)
+
+    def _upload_file(self, source: UploadSource, title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                     streaming: Optional[bool] = None, on_progress: Optional[Progress_t] = None,
+                     compress: Optional[str] = None) -> Tuple[bool, str]:
+        # In-memory sources always stream: files.upload would copy them into a multipart body
+        if source.path is None:
+            streaming = True
+        elif streaming is None:
+            streaming = self.streaming_upload_threshold is not None and source.length >= self.streaming_upload_threshold
+
+        filename = source.filename
+        if compress is not None:
+            level = pick_level(compress, source.length)
+            filename += SUFFIXES[compress]
+
+        if streaming:
+            if compress is None:
+                return self._upload_external(filename, source.chunks(), source.length, title, text, ts, on_progress)
+
+            # The upload URL needs the exact length up front, so the file is compressed twice
+            # (once to count, once to send) rather than spooled to a temporary copy
+            length = compressed_length(source.chunks(), compress, level)
+            chunks = iter_compressed(source.chunks(), compress, level)
+            return self._upload_external(filename, chunks, length, title, text, ts, on_progress)
+
+        file: Union[str, bytes] = str(source.path)
+        if compress is not None:
+            file = b"".join(iter_compressed(source.chunks(), compress, level))
 
-        ts = self._ts_holder.get(f"{id}")
+        try:
+            response = self._call_api(
+                "files.upload",
+                file=file,
+                filename=filename,
+                channels=self.channel_id,
+                title=title,
+                initial_comment=text,
+                thread_ts=ts
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
 
-        result, ts_or_error = self.send_rich_block(mobile_text, [header_block, divider_block, *body_blocks], ts)
+        return (True, response["file"]["id"])
 
+    def _upload_external(self, filename: str, chunks: Iterable[Union[bytes, memoryview]], length: int,
+                         title: Optional[str] = None, text: Optional[str] = None, ts: Optional[str] = None,
+                         on_progress: Optional[Progress_t] = None) -> Tuple[bool, str]:
+        result, file_id_or_error = self._begin_external_upload(filename, chunks, length, on_progress)
         if not result:
-            return (False, ts_or_error)
-
-        if ts is None:
-            self._ts_holder[f"{id}"] = ts_or_error
+            return (result, file_id_or_error)
 
-        return (True, "")
-
-    def send_error(self, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
-        header_block = self._get_header_block(f"エラーが発生しました --- {id}")
-        mobile_text = f"{id}でエラーが発生しました"
-
-        divider_block = self._get_divider_block()
+        return self._complete_external_upload(file_id_or_error, title or filename, text, ts)
 
-        body_fields = []
-        if optional is not None:
-            for key, value in optional.items():
-                body_fields.append(self._get_body_field(f"*{key}:* {value}"))
+    def _begin_external_upload(self, filename: str, chunks: Iterable[Union[bytes, memoryview]], length: int,
+                               on_progress: Optional[Progress_t] = None) -> Tuple[bool, str]:
+        try:
+            response = self._call_api("files.getUploadURLExternal", filename=filename, length=length)
+            stream_upload(response["upload_url"], chunks, length, self.upload_timeout, on_progress)
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+        except UploadTimeout:
+            return (False, "upload_timeout")
+        except OSError:
+            return (False, "upload_failed")
+
+        return (True, response["file_id"])
+
+    def _complete_external_upload(self, file_id: str, title: str, text: Optional[str] = None, ts: Optional[str] = None) -> Tuple[bool, str]:
+        try:
+            self._call_api(
+                "files.completeUploadExternal",
+                files=json.dumps([{"id": file_id, "title": title}]),
+                channel_id=self.channel_id,
+                initial_comment=text,
+                thread_ts=ts
+            )
+        except slack_api_error() as e:
+            return (False, slack_error_code(e))
+
+        return (True, file_id)
+
+    def _send_files(self, sources: Sequence[UploadSource], titles: Sequence[Optional[str]], ts: Optional[str] = None,
+                    compress: Optional[str] = None, max_workers: int = DEFAULT_UPLOAD_WORKERS) -> List[Tuple[bool, str]]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Uploads run concurrently (the rate limiter paces the upload methods across workers),
+        # but each file is only shared once every earlier one has been, so the thread keeps the given order
+        results: List[Tuple[bool, str]] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))), thread_name_prefix="training_manager-upload") as pool:
+            futures = [pool.submit(self._prepare_upload, source, compress) for source in sources]
+
+            for source, title, future in zip(sources, titles, futures):
+                try:
+                    result, file_id_or_error, digest, permalink = future.result()
+                except Exception:
+                    logger.exception("Failed to upload %s", source.filename)
+                    results.append((False, "upload_failed"))
+                    continue
+
+                if not result:
+                    results.append((result, file_id_or_error))
+                    continue
+
+                title = title or source.filename + (SUFFIXES[compress] if compress is not None else "")
+                if permalink is not None:
+                    results.append(self._post_cached_upload(file_id_or_error, permalink, title, None, ts))
+                    continue
+
+                result, file_id_or_error = self._complete_external_upload(file_id_or_error, title, None, ts)
+                if result and digest is not None:
+                    self._upload_cache.set(self._token_hash, self.user_id, digest, compress, file_id_or_error)
+                results.append((result, file_id_or_error))
+
+        return results
+
+    def _prepare_upload(self, source: UploadSource, compress: Optional[str] = None) -> Tuple[bool, str, Optional[str], Optional[str]]:
+        digest = None
+        if self._upload_cache is not None:
+            digest = hash_source(source)
+            entry = self._lookup_cached_upload(digest, compress)
+            if entry is not None:
+                return (True, entry["file_id"], digest, entry["permalink"])
+
+        filename = source.filename
+        chunks, length = source.chunks(), source.length
+        if compress is not None:
+            level = pick_level(compress, source.length)
+            filename += SUFFIXES[compress]
+            length = compressed_length(source.chunks(), compress, level)
+            chunks = iter_compressed(source.chunks(), compress, level)
+
+        result, file_id_or_error = self._begin_external_upload(filename, chunks, length)
+
+        return (result, file_id_or_error, digest, None)
+
+    def _send_plot(self, id: str, metrics: Optional[Sequence[str]] = None, title: Optional[str] = None,
+                   width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT) -> Tuple[bool, str]:
+        import numpy as np
+
+        # Downsampled to one point per horizontal pixel, so rendering cost does not grow with the run
+        series = []
+        for name, steps, values in self._history.snapshot(f"{id}", metrics):
+            series.append((name, *lttb(np.frombuffer(steps), np.frombuffer(values), width)))
+        if not series:
+            return (False, "no_history")
+
+        title = title or f"{id}"
+        try:
+            png = get_renderer().render(title, series, width, height)
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.error("Failed to render the plot for %s: %s", id, e)
+            return (False, "render_failed")
 
-        body_block = self._get_body_block(body_fields)
+        return self._send_file(UploadSource.from_buffer(png, f"{id}-metrics.png"), title, None, self._ts_holder.get(f"{id}"))
 
+    def _send_to_thread(self, id: str, mobile_text: str, blocks: Sequence[Any],
+                        reply_broadcast: Optional[bool] = None, icon_emoji: Optional[str] = None) -> Tuple[bool, str]:
         ts = self._ts_holder.get(f"{id}")
+        first_page, *follow_up_pages = self._paginate_blocks(blocks)
 
-        result, ts_or_error = self.send_rich_block(mobile_text, [header_block, divider_block, body_block], 
-                                                   ts, reply_broadcast, icon_emoji=":warning:")
+        result, ts_or_error = self._send_rich_block(mobile_text, first_page, ts, reply_broadcast, icon_emoji)
 
         if not result:
             return (False, ts_or_error)
 
         if ts is None:
-            self._ts_holder[f"{id}"] = ts_or_error
+            ts = self._ts_holder[f"{id}"] = ts_or_error
+
+        for page in follow_up_pages:
+            result, ts_or_error = self._send_rich_block(mobile_text, page, ts, icon_emoji=icon_emoji)
+            if not result:
+                return (False, ts_or_error)
 
         return (True, "")
 
-    def send_result(self, id: str, optional: dict) -> Tuple[bool, str]:
-        header_block = self._get_header_block(f"学習終了 --- {id}")
-        mobile_text = f"{id}の学習が終了しました"
+    def _send_training_start(self, id: str, optionals: Optional[Sequence[dict]] = None) -> Tuple[bool, str]:
+        mobile_text, blocks = self._build_training_start(id, optionals)
+
+        return self._send_to_thread(id, mobile_text, blocks)
 
-        divider_block = self._get_divider_block()
+    def _send_progress(self, id: str, optionals: Optional[Sequence[dict]] = None, sparkline: bool = False) -> Tuple[bool, str]:
+        if self.record_history:
+            self._history.resolve(f"{id}")
+        sparklines = None
+        if sparkline and optionals is not None:
+            sparklines = [self._recent.sparklines(f"{id}", optional) for optional in optionals]
 
-        body_fields = []
-        for key, value in optional.items():
-            body_fields.append(self._get_body_field(f"*{key}* : {value}"))
-        
-        body_block = self._get_body_block(body_fields)
+        mobile_text, blocks = self._build_progress(id, optionals, sparklines)
+
+        if not self.live_progress:
+            return self._send_to_thread(id, mobile_text, blocks)
+
+        # A live message is a single message, so only the first 50 blocks are kept
+        blocks, *overflow = self._paginate_blocks(blocks)
+        if overflow:
+            logger.warning("Live progress of `%s` exceeds %d blocks; the rest is omitted", id, len(blocks))
+
+        progress_ts = self._progress_ts_holder.get(f"{id}")
+        if progress_ts is not None:
+            result, ts_or_error = self._update_rich_block(progress_ts, mobile_text, blocks)
+            if result or ts_or_error not in ("message_not_found", "cant_update_message"):
+                return (True, "") if result else (False, ts_or_error)
 
         ts = self._ts_holder.get(f"{id}")
 
-        result, ts_or_error = self.send_rich_block(mobile_text, [header_block, divider_block, body_block], ts)
+        result, ts_or_error = self._send_rich_block(mobile_text, blocks, ts)
 
         if not result:
             return (False, ts_or_error)
 
         if ts is None:
             self._ts_holder[f"{id}"] = ts_or_error
+        self._progress_ts_holder[f"{id}"] = ts_or_error
 
         return (True, "")
-    
\ No newline at end of file
+
+    def _send_error(self, id: str, optional: dict, reply_broadcast: bool = True) -> Tuple[bool, str]:
+        mobile_text, blocks = self._build_error(id, optional)
+
+        return self._send_to_thread(id, mobile_text, blocks, reply_broadcast, icon_emoji=":warning:")
+
+    def _send_result(self, id: str, optional: dict) -> Tuple[bool, str]:
+        mobile_text, blocks = self._build_result(id, optional)
+
+        return self._send_to_thread(id, mobile_text, blocks)
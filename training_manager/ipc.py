@@ -0,0 +1,142 @@
+"ipc.py"
+
+import errno
+import json
+import os
+import socket
+import struct
+import tempfile
+
+try:
+    from typing import Optional, Any
+except ImportError:
+    from typing_extensions import Optional, Any # type: ignore
+
+from .values import resolve
+
+
+# Every message is a 4-byte big-endian length followed by that many bytes of UTF-8 JSON
+HEADER = struct.Struct("!I")
+MAX_MESSAGE_SIZE = 64 << 20
+
+
+def json_default(value: Any) -> Any:
+    # Tensors are read as numbers (arrays as their summary), NumPy scalars via `item()`, anything else as its string form
+    resolved = resolve(value)
+    if resolved is not value:
+        return resolved
+
+    item = getattr(value, "item", None)
+    if callable(item):
+        try:
+            return item()
+        except (TypeError, ValueError):
+            pass
+
+    return str(value)
+
+
+def encode_message(message: Any) -> bytes:
+    data = json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=json_default).encode("utf-8")
+    if len(data) > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {len(data)} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+
+    return HEADER.pack(len(data)) + data
+
+
+def send_message(sock: socket.socket, message: Any) -> None:
+    sock.sendall(encode_message(message))
+
+
+def send_bytes(sock: socket.socket, data: bytes) -> None:
+    # Same framing as send_message, for payloads that are not JSON (rendered images)
+    sock.sendall(HEADER.pack(len(data)))
+    sock.sendall(data)
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> Optional[bytes]:
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+
+    return bytes(buffer)
+
+
+def recv_bytes(sock: socket.socket) -> Optional[bytes]:
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {length} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+
+    return _recv_exactly(sock, length)
+
+
+def recv_message(sock: socket.socket) -> Optional[Any]:
+    data = recv_bytes(sock)
+    if data is None:
+        return None
+
+    return json.loads(data.decode("utf-8"))
+
+
+def default_socket_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"training_manager-{name}.sock")
+
+
+def is_listening(path: str) -> bool:
+    if not os.path.exists(path):
+        return False
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.settimeout(1.0)
+        probe.connect(path)
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+    return True
+
+
+def listen(path: str, backlog: int = 64) -> socket.socket:
+    # A socket file left behind by a crashed process would make bind() fail, but one that still accepts
+    # connections belongs to a live listener (another manager, possibly in this process) and is left alone
+    if is_listening(path):
+        raise OSError(errno.EADDRINUSE, f"Another listener owns {path}")
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        os.chmod(path, 0o600)
+        server.listen(backlog)
+    except OSError:
+        server.close()
+        raise
+
+    return server
+
+
+def connect(path: str, timeout: Optional[float] = None) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.settimeout(None)
+    except OSError:
+        sock.close()
+        raise
+
+    return sock
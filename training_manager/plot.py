@@ -0,0 +1,206 @@
+"plot.py"
+
+import atexit
+import io
+import logging
+import os
+import socket
+import sys
+import threading
+
+try:
+    from typing import Tuple, Optional, Sequence, TYPE_CHECKING
+except ImportError:
+    from typing_extensions import Tuple, Optional, Sequence, TYPE_CHECKING # type: ignore
+
+from . import ipc
+
+if TYPE_CHECKING:
+    import subprocess
+
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTH = 800
+DEFAULT_HEIGHT = 240
+DEFAULT_DPI = 100
+RENDER_TIMEOUT = 120.0
+
+
+def require_plotting() -> None:
+    import importlib.util
+
+    for module in ("numpy", "matplotlib"):
+        if importlib.util.find_spec(module) is None:
+            raise ImportError(f"`send_plot` requires `numpy` and `matplotlib`. Install them with `pip3 install numpy matplotlib`")
+
+
+def lttb(x: "np.ndarray", y: "np.ndarray", n_out: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    # Largest-Triangle-Three-Buckets: keeps the points that shape the curve (spikes, plateaus, drops)
+    import numpy as np
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return (x, y)
+
+    # n_out - 2 buckets over the points between the (always kept) first and last one
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    # One vectorized pass per bucket: interpreter work grows with n_out, not with the history length
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[b]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[b] - ay))
+        a = lo + int(area.argmax())
+        selected[b + 1] = a
+
+    return (x[selected], y[selected])
+
+
+def render_png(title: str, series: Sequence[Tuple[str, Sequence[float], Sequence[float]]],
+               width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT, dpi: int = DEFAULT_DPI) -> bytes:
+    # Figure + Agg canvas directly: no pyplot state, no GUI backend
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(width / dpi, height * len(series) / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(len(series), 1, sharex=True, squeeze=False)[:, 0]
+    for ax, (name, xs, ys) in zip(axes, series):
+        ax.plot(xs, ys, linewidth=1)
+        ax.set_ylabel(name)
+        ax.grid(alpha=0.3)
+    axes[-1].set_xlabel("step")
+    fig.suptitle(title)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+
+    return buffer.getvalue()
+
+
+class Renderer:
+    # A long-lived child interpreter running `serve`: matplotlib is imported once, outside this process and its GIL
+    def __init__(self, timeout: float = RENDER_TIMEOUT) -> None:
+        self.timeout = timeout
+        self._proc: Optional["subprocess.Popen"] = None
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        import subprocess
+
+        parent, child = socket.socketpair()
+        # The child must find this package even when it is imported from a source checkout
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        pythonpath = os.pathsep.join(filter(None, (package_root, os.environ.get("PYTHONPATH"))))
+        try:
+            # A fresh interpreter rather than multiprocessing, which would re-import the training script
+            self._proc = subprocess.Popen(
+                [sys.executable, "-c", "import sys; from training_manager.plot import main; sys.exit(main())", "--fd", str(child.fileno())],
+                pass_fds=(child.fileno(),), stdin=subprocess.DEVNULL, env={**os.environ, "PYTHONPATH": pythonpath, "MPLBACKEND": "Agg"},
+            )
+        except OSError:
+            parent.close()
+            raise
+        finally:
+            child.close()
+        self._sock = parent
+
+    def render(self, title: str, series: Sequence[Tuple[str, Sequence[float], Sequence[float]]],
+               width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT) -> bytes:
+        tolist = lambda values: values.tolist() if hasattr(values, "tolist") else list(values)
+        request = {"title": title, "series": [[name, tolist(xs), tolist(ys)] for name, xs, ys in series],
+                   "width": width, "height": height}
+        with self._lock:
+            if self._sock is None:
+                self._start()
+            try:
+                self._sock.settimeout(self.timeout)
+                ipc.send_message(self._sock, request)
+                reply = ipc.recv_message(self._sock)
+                if reply is None:
+                    raise OSError("renderer exited")
+                if not reply["ok"]:
+                    raise RuntimeError(reply["error"])
+                data = ipc.recv_bytes(self._sock)
+                if data is None:
+                    raise OSError("renderer exited")
+            except (OSError, ValueError):
+                self._stop()
+                raise
+
+        return data
+
+    def _stop(self) -> None:
+        import subprocess
+
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._proc is not None:
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+_renderer: Optional[Renderer] = None
+_renderer_lock = threading.Lock()
+
+def get_renderer() -> Renderer:
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = Renderer()
+            atexit.register(_renderer.close)
+
+    return _renderer
+
+
+def serve(fd: int) -> None:
+    sock = socket.socket(fileno=fd)
+    while True:
+        request = ipc.recv_message(sock)
+        if request is None:
+            return
+        try:
+            data = render_png(request["title"], request["series"], request["width"], request["height"])
+        except Exception as e:
+            logger.exception("Failed to render %s", request.get("title"))
+            ipc.send_message(sock, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            continue
+        ipc.send_message(sock, {"ok": True})
+        ipc.send_bytes(sock, data)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render metric plots for training_manager")
+    parser.add_argument("--fd", type=int, required=True, help="connected socket inherited from the parent")
+    args = parser.parse_args(argv)
+
+    serve(args.fd)
+
+    return 0
@@ -0,0 +1,117 @@
+"ratelimit.py"
+
+import threading
+import time
+
+try:
+    from typing import Tuple, Optional, Dict, Any, Mapping
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, Any, Mapping # type: ignore
+
+from .utils import hash_token
+
+
+# (requests per second, burst) for each Slack API method we call.
+# https://api.slack.com/docs/rate-limits
+METHOD_RATES: Dict[str, Tuple[float, float]] = {
+    "chat.postMessage": (1.0, 3.0),
+    "chat.update": (50 / 60, 5.0),
+    "files.upload": (20 / 60, 3.0),
+    "files.getUploadURLExternal": (100 / 60, 10.0),
+    "files.completeUploadExternal": (100 / 60, 10.0),
+    "files.info": (100 / 60, 10.0),
+    "conversations.open": (50 / 60, 5.0),
+}
+DEFAULT_RATE: Tuple[float, float] = (20 / 60, 3.0)
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError(f"`rate` and `capacity` must be positive but got `{rate}` and `{capacity}`")
+
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Tokens may go negative: callers queue up behind each other in reservation order
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, delay: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = now
+
+
+class RateLimiter:
+    _registry: Dict[str, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, rates: Optional[Mapping[str, Tuple[float, float]]] = None) -> None:
+        self.rates: Dict[str, Tuple[float, float]] = dict(METHOD_RATES if rates is None else rates)
+
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_token(cls, token: str) -> "RateLimiter":
+        key = hash_token(token)
+        with cls._registry_lock:
+            limiter = cls._registry.get(key)
+            if limiter is None:
+                limiter = cls._registry[key] = cls()
+
+        return limiter
+
+    def bucket(self, method: str, scope: Optional[str] = None) -> TokenBucket:
+        key = (method, scope)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.rates.get(method, DEFAULT_RATE)
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+
+        return bucket
+
+    def reserve(self, method: str, scope: Optional[str] = None) -> float:
+        return self.bucket(method, scope).reserve()
+
+    def acquire(self, method: str, scope: Optional[str] = None) -> None:
+        self.bucket(method, scope).acquire()
+
+    def penalize(self, method: str, retry_after: float, scope: Optional[str] = None) -> None:
+        self.bucket(method, scope).penalize(retry_after)
+
+
+def get_retry_after(headers: Optional[Mapping[str, Any]]) -> float:
+    for key, value in (headers or {}).items():
+        if key.lower() == "retry-after":
+            if isinstance(value, (list, tuple)):
+                value = value[0]
+            try:
+                return max(float(value), 0.0)
+            except (TypeError, ValueError):
+                break
+
+    return DEFAULT_RETRY_AFTER
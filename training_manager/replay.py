@@ -0,0 +1,81 @@
+"replay.py"
+
+import argparse
+import logging
+import os
+import sys
+
+try:
+    from typing import Optional, Sequence
+except ImportError:
+    from typing_extensions import Optional, Sequence # type: ignore
+
+from .daemon import TOKEN_ENVS
+from .interface import TrainingManager
+from .spool import Spool
+from .utils import hash_token
+
+
+logger = logging.getLogger(__name__)
+
+
+def replay_directory(spool_dir: str, bot_token: str, ts_store: Optional[str] = None) -> int:
+    # Returns the number of jobs still pending afterwards
+    remaining = 0
+    token_hash = hash_token(bot_token)
+    for path in Spool.find(spool_dir):
+        spool = Spool.open(path)
+        if spool is None:
+            logger.info("Skipped %s: still held by a running process", path.name)
+            continue
+
+        try:
+            if spool.header.get("token_hash") != token_hash:
+                logger.warning("Skipped %s: written with a different bot token", path.name)
+                remaining += len(spool.pending)
+                continue
+
+            if spool.pending:
+                # The run's own thread store keeps follow-ups in the threads they started in
+                manager = TrainingManager(bot_token, spool.header["user_id"], ts_store=ts_store or spool.header.get("ts_store"))
+                try:
+                    total = len(spool.pending)
+                    drained = spool.replay(manager._deliver)
+                    logger.info("%s: delivered %d of %d", path.name, total - len(spool.pending), total)
+                finally:
+                    manager.close()
+                if not drained:
+                    remaining += len(spool.pending)
+                    logger.warning("Stopped at %s: Slack is still unreachable", path.name)
+                    break
+        finally:
+            spool.close()
+
+    return remaining
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m training_manager.replay",
+                                     description="Deliver notifications spooled by runs that ended while Slack was unreachable")
+    parser.add_argument("spool_dir")
+    parser.add_argument("--bot-token", default=None, help=f"Slack bot token (default: ${' or $'.join(TOKEN_ENVS)})")
+    parser.add_argument("--ts-store", default=None, help="thread store to use instead of the one recorded in each spool")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    bot_token = args.bot_token or next((os.environ[key] for key in TOKEN_ENVS if os.environ.get(key)), None)
+    if not bot_token:
+        parser.error(f"a bot token is required: pass --bot-token or set {' or '.join(TOKEN_ENVS)}")
+
+    remaining = replay_directory(args.spool_dir, bot_token, args.ts_store)
+    if remaining:
+        print(f"{remaining} notification(s) are still spooled in {args.spool_dir}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"retry.py"
+
+import errno
+import random
+import socket
+import sys
+import time
+
+try:
+    from typing import Tuple, Optional
+except ImportError:
+    from typing_extensions import Tuple, Optional # type: ignore
+
+from .utils import response_status, slack_error_code
+
+
+# Slack error codes that describe a blip on Slack's side rather than a bad request
+# https://api.slack.com/methods/chat.postMessage#errors
+RETRYABLE_SLACK_ERRORS = frozenset((
+    "ratelimited", "internal_error", "fatal_error", "service_unavailable", "request_timeout",
+))
+RETRYABLE_ERRNOS = frozenset((
+    errno.ENETUNREACH, errno.ENETDOWN, errno.EHOSTUNREACH, errno.ETIMEDOUT,
+))
+
+
+def network_errors() -> Tuple[type, ...]:
+    from http.client import HTTPException
+    from urllib.error import URLError
+
+    errors: Tuple[type, ...] = (ConnectionError, TimeoutError, socket.timeout, socket.gaierror, URLError, HTTPException)
+    # Only the clients that are already loaded can have raised
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None:
+        errors += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is not None:
+        errors += (asyncio.TimeoutError,)
+
+    return errors
+
+
+def is_network_error(error: BaseException) -> bool:
+    if isinstance(error, network_errors()):
+        return True
+
+    return isinstance(error, OSError) and error.errno in RETRYABLE_ERRNOS
+
+
+def error_code(error: BaseException) -> str:
+    # Network failures surface as `(False, code)` like Slack's own errors
+    if isinstance(error, (TimeoutError, socket.timeout)) or "timeout" in type(error).__name__.lower():
+        return "request_timeout"
+
+    return "connection_error"
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 deadline: Optional[float] = 120.0, jitter: bool = True) -> None:
+        if max_attempts < 1:
+            raise ValueError(f"`max_attempts` must be positive but got `{max_attempts}`")
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+
+    def is_retryable(self, error: BaseException) -> bool:
+        response = getattr(error, "response", None)
+        status = response_status(response)
+        if status is not None:
+            if status == 429 or status >= 500:
+                return True
+            return slack_error_code(error) in RETRYABLE_SLACK_ERRORS
+
+        return is_network_error(error)
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads the retries of many processes hit by the same blip
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def next_delay(self, attempt: int, started: float, error: BaseException) -> Optional[float]:
+        if attempt + 1 >= self.max_attempts or not self.is_retryable(error):
+            return None
+
+        delay = self.backoff(attempt)
+        if self.deadline is not None and time.monotonic() + delay - started > self.deadline:
+            return None
+
+        return delay
+
+
+DEFAULT_RETRY = RetryPolicy()
@@ -0,0 +1,170 @@
+"sender.py"
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+try:
+    from typing import Tuple, Optional, Dict, List, Any, Callable, Deque, NamedTuple, Sequence
+except ImportError:
+    from typing_extensions import Tuple, Optional, Dict, List, Any, Callable, Deque, NamedTuple, Sequence # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BACKPRESSURE_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class Job(NamedTuple):
+    kind: str
+    id: Optional[str]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+
+
+class BackgroundSender:
+    def __init__(
+        self,
+        dispatch: Callable[[Job], Tuple[bool, str]],
+        maxsize: int = 1024,
+        backpressure: str = BLOCK,
+        name: str = "training_manager-sender",
+        merge: Optional[Callable[[Job, Job], Job]] = None,
+        coalesce_kinds: Sequence[str] = (),
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError(f"`maxsize` must be positive but got `{maxsize}`")
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"`backpressure` expected one of {BACKPRESSURE_POLICIES} but got `{backpressure}`")
+
+        self._dispatch = dispatch
+        self.maxsize = maxsize
+        self.backpressure = backpressure
+
+        self._merge = merge
+        self.coalesce_kinds = frozenset(coalesce_kinds) if merge is not None else frozenset()
+
+        # Each queued job sits in a one-element list so a pending job can be replaced in place
+        self._queue: Deque[List[Job]] = deque()
+        self._pending: Dict[Tuple[str, str], List[Job]] = {}
+        self._cond = threading.Condition()
+        self._unfinished = 0
+        self._closed = False
+        self.dropped = 0
+        self.coalesced = 0
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+        _live_senders.add(self)
+
+    def submit(self, job: Job) -> Tuple[bool, str]:
+        with self._cond:
+            if self._closed:
+                return (False, "sender_closed")
+
+            if job.id is not None:
+                if job.kind in self.coalesce_kinds:
+                    slot = self._pending.get((job.kind, job.id))
+                    if slot is not None:
+                        slot[0] = self._merge(slot[0], job)
+                        self.coalesced += 1
+                        return (True, "")
+                else:
+                    # Never merge a later job across an error or result of the same run
+                    for kind in self.coalesce_kinds:
+                        self._pending.pop((kind, job.id), None)
+
+            if len(self._queue) >= self.maxsize:
+                if self.backpressure == DROP_NEWEST:
+                    self.dropped += 1
+                    return (False, "queue_full")
+                elif self.backpressure == DROP_OLDEST:
+                    self._forget(self._queue.popleft())
+                    self._unfinished -= 1
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return (False, "sender_closed")
+
+            slot = [job]
+            self._queue.append(slot)
+            if job.id is not None and job.kind in self.coalesce_kinds:
+                self._pending[(job.kind, job.id)] = slot
+            self._unfinished += 1
+            self._cond.notify_all()
+
+        return (True, "")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._unfinished > 0:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        _live_senders.discard(self)
+
+        return flushed
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _forget(self, slot: List[Job]) -> None:
+        key = (slot[0].kind, slot[0].id)
+        if self._pending.get(key) is slot:
+            del self._pending[key]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                slot = self._queue.popleft()
+                self._forget(slot)
+                job = slot[0]
+                self._cond.notify_all()
+
+            try:
+                result, error = self._dispatch(job)
+                if not result:
+                    logger.warning("Failed to send `%s` for `%s`: %s", job.kind, job.id, error)
+            except Exception:
+                logger.exception("Unexpected error while sending `%s` for `%s`", job.kind, job.id)
+            finally:
+                with self._cond:
+                    self._unfinished -= 1
+                    self._cond.notify_all()
+
+
+_live_senders: "weakref.WeakSet[BackgroundSender]" = weakref.WeakSet()
+
+EXIT_FLUSH_TIMEOUT = 10.0
+
+@atexit.register
+def _close_live_senders() -> None:
+    for sender in list(_live_senders):
+        sender.close(EXIT_FLUSH_TIMEOUT)
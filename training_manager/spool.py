@@ -0,0 +1,274 @@
+"spool.py"
+
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    from typing import Tuple, Union, Optional, Dict, List, Any, Callable, Iterator
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Dict, List, Any, Callable, Iterator # type: ignore
+
+from pathlib import Path
+
+from .ipc import json_default
+from .retry import RETRYABLE_SLACK_ERRORS
+from .sender import Job
+from .upload import UploadSource
+
+
+logger = logging.getLogger(__name__)
+
+# `(False, code)` results that mean "Slack was unreachable", as opposed to a request Slack rejected
+SPOOLED_ERRORS = RETRYABLE_SLACK_ERRORS | frozenset(("connection_error", "request_timeout", "upload_failed", "upload_timeout"))
+SPOOL_SUFFIX = ".wal"
+DEFAULT_REPLAY_INTERVAL = 30.0
+
+Deliver_t = Callable[[Job], Any]
+
+
+def is_spooled_error(result: Any) -> bool:
+    return isinstance(result, tuple) and len(result) == 2 and result[0] is False and result[1] in SPOOLED_ERRORS
+
+
+def _lock_file(f: Any) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return True
+
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+
+    return True
+
+
+class Spool:
+    def __init__(
+        self,
+        path: Union[str, Path],
+        header: Dict[str, Any],
+        fsync_every: int = 16,
+        fsync_interval: float = 1.0,
+        replay_interval: float = DEFAULT_REPLAY_INTERVAL,
+    ) -> None:
+        self.path = Path(path)
+        self.blob_dir = self.path.parent / "blobs"
+        self.header = header
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.replay_interval = replay_interval
+
+        # seq -> encoded job, in append order; acknowledged jobs are removed
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self._next_seq = 1
+        self._file: Optional[Any] = None
+        self._lock = threading.RLock()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._failed_at: Optional[float] = None
+
+    @classmethod
+    def create(cls, directory: Union[str, Path], token_hash: str, user_id: str,
+               ts_store: Optional[Union[str, Path]] = None, **kwargs: Any) -> "Spool":
+        directory = Path(directory)
+        name = f"{token_hash}-{user_id}-{os.getpid()}-{int(time.time() * 1000)}{SPOOL_SUFFIX}"
+        header = {
+            "type": "header", "token_hash": token_hash, "user_id": user_id,
+            "ts_store": None if ts_store is None else str(Path(ts_store).resolve()), "created": time.time(),
+        }
+
+        return cls(directory / name, header, **kwargs)
+
+    @classmethod
+    def open(cls, path: Union[str, Path], **kwargs: Any) -> Optional["Spool"]:
+        # Returns None while another process still holds the log
+        path = Path(path)
+        f = open(path, "a+", encoding="utf-8")
+        if not _lock_file(f):
+            f.close()
+            return None
+
+        f.seek(0)
+        header: Dict[str, Any] = {}
+        spool = cls(path, header, **kwargs)
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-write; everything before it is intact
+                continue
+            if record["type"] == "header":
+                header.update(record)
+            elif record["type"] == "job":
+                spool.pending[record["seq"]] = record
+                spool._next_seq = max(spool._next_seq, record["seq"] + 1)
+            elif record["type"] == "ack":
+                spool.pending.pop(record["seq"], None)
+
+        spool._file = f
+
+        return spool
+
+    @staticmethod
+    def find(directory: Union[str, Path]) -> List[Path]:
+        return sorted(Path(directory).glob(f"*{SPOOL_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+
+    def _write(self, record: Dict[str, Any], durable: bool) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            _lock_file(self._file)
+            self._file.write(json.dumps(self.header) + "\n")
+
+        self._file.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+        self._file.flush()
+
+        if durable:
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+                self.sync()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._file is not None and self._unsynced > 0:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def _encode_source(self, source: UploadSource, seq: int, index: int) -> Dict[str, Any]:
+        if source.path is not None:
+            return {"path": str(source.path.resolve()), "filename": source.filename}
+
+        # In-memory uploads have nothing on disk to point at, so their bytes are kept next to the log
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        blob = self.blob_dir / f"{self.path.stem}-{seq}-{index}"
+        with open(blob, "wb") as f:
+            for chunk in source.chunks():
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        return {"path": str(blob), "filename": source.filename, "blob": True}
+
+    def _encode_job(self, job: Job, seq: int) -> Dict[str, Any]:
+        args = list(job.args)
+        if job.kind == "file":
+            args[0] = self._encode_source(args[0], seq, 0)
+            # Progress callbacks belong to the process that made the call
+            args[5] = None
+        elif job.kind == "files":
+            args[0] = [self._encode_source(source, seq, i) for i, source in enumerate(args[0])]
+
+        return {"type": "job", "seq": seq, "kind": job.kind, "id": job.id, "args": args, "kwargs": job.kwargs}
+
+    @staticmethod
+    def _decode_job(record: Dict[str, Any]) -> Job:
+        args = list(record["args"])
+        if record["kind"] == "file":
+            args[0] = UploadSource.create(args[0]["path"], args[0]["filename"])
+        elif record["kind"] == "files":
+            args[0] = [UploadSource.create(ref["path"], ref["filename"]) for ref in args[0]]
+
+        return Job(record["kind"], record["id"], tuple(args), record["kwargs"])
+
+    def append(self, job: Job) -> int:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            record = self._encode_job(job, seq)
+            self._write(record, durable=True)
+            self.pending[seq] = record
+
+        return seq
+
+    def ack(self, seq: int) -> None:
+        with self._lock:
+            record = self.pending.pop(seq, None)
+            if record is None:
+                return
+            # Losing an ack to a crash only means a duplicate message on replay, so acks are not fsynced
+            self._write({"type": "ack", "seq": seq}, durable=False)
+
+        for ref in self._blobs(record):
+            try:
+                os.unlink(ref)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _blobs(record: Dict[str, Any]) -> Iterator[str]:
+        refs = []
+        if record["kind"] == "file":
+            refs = [record["args"][0]]
+        elif record["kind"] == "files":
+            refs = record["args"][0]
+
+        for ref in refs:
+            if ref.get("blob"):
+                yield ref["path"]
+
+    def replay(self, deliver: Deliver_t) -> bool:
+        # Delivers pending jobs in order; stops (and returns False) at the first one Slack is still unreachable for
+        with self._lock:
+            for seq, record in list(self.pending.items()):
+                try:
+                    job = self._decode_job(record)
+                except (ValueError, TypeError, KeyError) as e:
+                    logger.error("Dropped spooled %s #%d: %s", record.get("kind"), seq, e)
+                    self.ack(seq)
+                    continue
+
+                result = deliver(job)
+                if is_spooled_error(result) or (isinstance(result, list) and any(is_spooled_error(r) for r in result)):
+                    self._failed_at = time.monotonic()
+                    return False
+                if isinstance(result, tuple) and not result[0]:
+                    logger.error("Spooled %s #%d was rejected: %s", job.kind, seq, result[1])
+                self.ack(seq)
+
+            self._failed_at = None
+            self.sync()
+
+        return True
+
+    def dispatch(self, job: Job, deliver: Deliver_t) -> Any:
+        with self._lock:
+            if self.pending:
+                # Keep the original order: nothing new goes out until the backlog has been delivered
+                due = self._failed_at is None or time.monotonic() - self._failed_at >= self.replay_interval
+                if not due or not self.replay(deliver):
+                    self.append(job)
+                    return [(True, "spooled")] * len(job.args[0]) if job.kind == "files" else (True, "spooled")
+
+            result = deliver(job)
+            if job.kind == "files":
+                failed = [i for i, r in enumerate(result) if is_spooled_error(r)]
+                if failed:
+                    sources, titles, *rest = job.args
+                    self.append(job._replace(args=([sources[i] for i in failed], [titles[i] for i in failed], *rest)))
+                    self._failed_at = time.monotonic()
+                    result = [(True, "spooled") if i in failed else r for i, r in enumerate(result)]
+            elif is_spooled_error(result):
+                self.append(job)
+                self._failed_at = time.monotonic()
+                result = (True, "spooled")
+
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None or self._file.closed:
+                return
+            self.sync()
+            self._file.close()
+
+            if not self.pending:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
@@ -0,0 +1,402 @@
+"store.py"
+
+import abc
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+try:
+    from typing import Tuple, Union, Optional, Dict, Any, Iterator, MutableMapping, TextIO
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Dict, Any, Iterator, MutableMapping, TextIO # type: ignore
+
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): a JsonLinesStore then never rewrites its file
+    fcntl = None # type: ignore
+
+
+class Store(abc.ABC):
+    @abc.abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    def keys(self) -> Iterator[str]:
+        pass
+
+    def sync(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStore(Store):
+    def __init__(self) -> None:
+        self._cache: Dict[str, Any] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        self._cache[key] = value
+
+    def delete(self, key: str) -> None:
+        self._cache.pop(key, None)
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._cache))
+
+
+class JsonLinesStore(MemoryStore):
+    def __init__(self, path: Union[str, Path], fsync_every: int = 16, fsync_interval: float = 1.0) -> None:
+        super().__init__()
+
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Other processes may append to the same path: appends and compaction are serialized on a sidecar
+        # lock file, which, unlike the store file, is never replaced
+        self._lock_file: Optional[TextIO] = None
+        if fcntl is not None:
+            self._lock_file = open(self.path.with_name(self.path.name + ".lock"), "a")
+
+        with self._file_lock():
+            n_lines = self._load()
+            if self._lock_file is not None and n_lines > 2 * len(self._cache) + 64:
+                self._compact()
+            self._file = open(self.path, "a", encoding="utf-8")
+        _open_stores.add(self)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if self._lock_file is None:
+            yield
+            return
+
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_replaced(self) -> None:
+        # Another instance compacted the file: appending to the old inode would lose the record
+        try:
+            replaced = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._sync()
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self) -> int:
+        if not self.path.exists():
+            return 0
+
+        n_lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                n_lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    continue
+                if record.get("d"):
+                    self._cache.pop(record["k"], None)
+                else:
+                    self._cache[record["k"]] = record["v"]
+
+        return n_lines
+
+    def _compact(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, value in self._cache.items():
+                f.write(json.dumps({"k": key, "v": value}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._lock, self._file_lock():
+            self._reopen_if_replaced()
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self) -> None:
+        if self._unsynced > 0 and not self._file.closed:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def set(self, key: str, value: Any) -> None:
+        if self._cache.get(key) == value:
+            return
+        super().set(key, value)
+        self._append({"k": key, "v": value})
+
+    def delete(self, key: str) -> None:
+        if key not in self._cache:
+            return
+        super().delete(key)
+        self._append({"k": key, "d": True})
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+        _open_stores.discard(self)
+
+
+class SqliteStore(MemoryStore):
+    def __init__(self, path: Union[str, Path]) -> None:
+        import sqlite3
+
+        super().__init__()
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        for key, value in self._conn.execute("SELECT key, value FROM kv"):
+            self._cache[key] = json.loads(value)
+
+        _open_stores.add(self)
+
+    def set(self, key: str, value: Any) -> None:
+        if self._cache.get(key) == value:
+            return
+        super().set(key, value)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def delete(self, key: str) -> None:
+        super().delete(key)
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        _open_stores.discard(self)
+
+
+def open_store(path: Union[str, Path]) -> Store:
+    if Path(path).suffix in (".db", ".sqlite", ".sqlite3"):
+        return SqliteStore(path)
+
+    return JsonLinesStore(path)
+
+
+def resolve_store(store: Optional[Union[str, Path, Store]]) -> Tuple[Store, bool]:
+    if store is None:
+        return (MemoryStore(), True)
+    elif isinstance(store, Store):
+        return (store, False)
+    elif isinstance(store, (str, Path)):
+        # Shared like the channel and upload caches: one instance per path in the process, owned by none of them
+        return (shared_store(store), False)
+
+    raise TypeError(f"`ts_store` expected `str`, `pathlib.Path` or `Store` but got `{type(store).__name__}`")
+
+
+_shared_stores: Dict[str, Store] = {}
+_shared_stores_lock = threading.Lock()
+
+def shared_store(path: Union[str, Path]) -> Store:
+    key = os.path.abspath(os.path.expanduser(str(path)))
+    with _shared_stores_lock:
+        store = _shared_stores.get(key)
+        if store is None:
+            store = _shared_stores[key] = open_store(key)
+
+    return store
+
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "training_manager"
+
+
+class CacheFile:
+    # A file in default_cache_dir(), found when it is opened rather than at import: with no $HOME and no
+    # passwd entry (a container UID), Path.home() raises
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def path(self) -> Path:
+        try:
+            return default_cache_dir() / self.name
+        except (RuntimeError, KeyError) as e:
+            raise OSError(f"Cannot locate the cache directory for `{self.name}`: {e}") from None
+
+    def __repr__(self) -> str:
+        return f"CacheFile({self.name!r})"
+
+
+def cache_path(path: Union[str, Path, CacheFile]) -> Union[str, Path]:
+    return path.path() if isinstance(path, CacheFile) else path
+
+
+DEFAULT_CHANNEL_CACHE = CacheFile("channels.jsonl")
+DEFAULT_CHANNEL_CACHE_TTL = 7 * 24 * 60 * 60.0
+
+class ChannelCache:
+    def __init__(self, store: Store, ttl: float = DEFAULT_CHANNEL_CACHE_TTL) -> None:
+        self.store = store
+        self.ttl = ttl
+
+    @classmethod
+    def open(cls, cache: Optional[Union[str, Path, CacheFile, Store]], ttl: float = DEFAULT_CHANNEL_CACHE_TTL) -> Optional["ChannelCache"]:
+        if cache is None:
+            return None
+        elif isinstance(cache, Store):
+            return cls(cache, ttl)
+        elif isinstance(cache, (str, Path, CacheFile)):
+            try:
+                return cls(shared_store(cache_path(cache)), ttl)
+            except OSError:
+                # A read-only or missing home directory only costs us the conversations.open call
+                return None
+
+        raise TypeError(f"`channel_cache` expected `str`, `pathlib.Path` or `Store` but got `{type(cache).__name__}`")
+
+    def get(self, token_hash: str, user_id: str) -> Optional[str]:
+        entry = self.store.get(f"{token_hash}:{user_id}")
+        if entry is None or entry["expires"] < time.time():
+            return None
+
+        return entry["id"]
+
+    def set(self, token_hash: str, user_id: str, channel_id: str) -> None:
+        try:
+            self.store.set(f"{token_hash}:{user_id}", {"id": channel_id, "expires": time.time() + self.ttl})
+        except OSError:
+            pass
+
+
+DEFAULT_UPLOAD_CACHE = CacheFile("uploads.jsonl")
+
+class UploadCache:
+    def __init__(self, store: Store) -> None:
+        self.store = store
+
+    @classmethod
+    def open(cls, cache: Optional[Union[str, Path, CacheFile, Store]]) -> Optional["UploadCache"]:
+        if cache is None:
+            return None
+        elif isinstance(cache, Store):
+            return cls(cache)
+        elif isinstance(cache, (str, Path, CacheFile)):
+            return cls(shared_store(cache_path(cache)))
+
+        raise TypeError(f"`upload_cache` expected `str`, `pathlib.Path` or `Store` but got `{type(cache).__name__}`")
+
+    def _key(self, token_hash: str, user_id: str, digest: str, variant: Optional[str]) -> str:
+        # Per recipient: a permalink only opens for users the file was shared with
+        return f"{token_hash}:{user_id}:{digest}:{variant or 'raw'}"
+
+    def get(self, token_hash: str, user_id: str, digest: str, variant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.store.get(self._key(token_hash, user_id, digest, variant))
+
+    def set(self, token_hash: str, user_id: str, digest: str, variant: Optional[str], file_id: str,
+            permalink: Optional[str] = None) -> None:
+        try:
+            self.store.set(self._key(token_hash, user_id, digest, variant), {"file_id": file_id, "permalink": permalink})
+        except OSError:
+            pass
+
+    def delete(self, token_hash: str, user_id: str, digest: str, variant: Optional[str] = None) -> None:
+        try:
+            self.store.delete(self._key(token_hash, user_id, digest, variant))
+        except OSError:
+            pass
+
+
+class TsHolder(MutableMapping):
+    def __init__(self, store: Store, namespace: str) -> None:
+        self.store = store
+        self.namespace = namespace
+
+    def _key(self, id: str) -> str:
+        return f"{self.namespace}/{id}"
+
+    def __getitem__(self, id: str) -> str:
+        value = self.store.get(self._key(id))
+        if value is None:
+            raise KeyError(id)
+
+        return value
+
+    def get(self, id: str, default: Optional[str] = None) -> Optional[str]:
+        return self.store.get(self._key(id), default)
+
+    def __setitem__(self, id: str, ts: str) -> None:
+        self.store.set(self._key(id), ts)
+
+    def __delitem__(self, id: str) -> None:
+        if self.get(id) is None:
+            raise KeyError(id)
+        self.store.delete(self._key(id))
+
+    def __contains__(self, id: object) -> bool:
+        return self.get(f"{id}") is not None
+
+    def __iter__(self) -> Iterator[str]:
+        prefix = f"{self.namespace}/"
+        for key in self.store.keys():
+            if key.startswith(prefix):
+                yield key[len(prefix):]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+_open_stores: "weakref.WeakSet[Store]" = weakref.WeakSet()
+
+# Only sync at exit: queued senders may still write while the interpreter shuts down
+@atexit.register
+def _sync_open_stores() -> None:
+    for store in list(_open_stores):
+        store.sync()
@@ -0,0 +1,204 @@
+"transport.py"
+
+import io
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+
+try:
+    from typing import Tuple, Union, Optional, Dict, Any, Deque, TYPE_CHECKING
+except ImportError:
+    from typing_extensions import Tuple, Union, Optional, Dict, Any, Deque, TYPE_CHECKING # type: ignore
+
+if TYPE_CHECKING:
+    import ssl
+    from http.client import HTTPConnection, HTTPMessage
+    from slack_sdk import WebClient
+
+
+logger = logging.getLogger(__name__)
+
+URLLIB = "urllib"
+POOLED = "pooled"
+TRANSPORTS = (URLLIB, POOLED)
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_HTTP_TIMEOUT = 30.0
+
+Transport_t = Union[str, "ConnectionPool"]
+
+
+class ConnectionPool:
+    def __init__(self, maxsize: int = DEFAULT_POOL_SIZE, timeout: Optional[float] = DEFAULT_HTTP_TIMEOUT,
+                 ssl_context: Optional["ssl.SSLContext"] = None) -> None:
+        if maxsize < 1:
+            raise ValueError(f"`pool_size` must be positive but got `{maxsize}`")
+
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._ssl_context = ssl_context
+
+        # Idle keep-alive connections per (scheme, host, port); at most `maxsize` are kept per origin
+        self._idle: Dict[Tuple[str, str, Optional[int]], Deque["HTTPConnection"]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _new_connection(self, scheme: str, host: str, port: Optional[int], timeout: Optional[float]) -> "HTTPConnection":
+        import socket
+        from http.client import HTTPConnection, HTTPSConnection
+
+        self.created += 1
+        if scheme == "https":
+            if self._ssl_context is None:
+                import ssl
+
+                self._ssl_context = ssl.create_default_context()
+            conn: HTTPConnection = HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = HTTPConnection(host, port, timeout=timeout)
+
+        # Small requests on a warm connection must not wait on Nagle's algorithm
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        return conn
+
+    def _checkout(self, origin: Tuple[str, str, Optional[int]]) -> Optional["HTTPConnection"]:
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+
+        return None
+
+    def _checkin(self, origin: Tuple[str, str, Optional[int]], conn: "HTTPConnection") -> None:
+        with self._lock:
+            idle = self._idle.setdefault(origin, deque())
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None, headers: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None) -> Tuple[int, str, "HTTPMessage", bytes]:
+        from http.client import HTTPException, RemoteDisconnected
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        timeout = self.timeout if timeout is None else timeout
+
+        conn = self._checkout(origin)
+        while True:
+            reused = conn is not None
+            if conn is None:
+                conn = self._new_connection(parts.scheme, parts.hostname, parts.port, timeout)
+            elif conn.sock is not None:
+                conn.sock.settimeout(timeout)
+
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server closed an idle keep-alive connection; a fresh one is safe to try once
+                if reused:
+                    conn = None
+                    continue
+                raise
+            except (OSError, HTTPException):
+                conn.close()
+                raise
+
+            break
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(origin, conn)
+
+        return (response.status, response.reason, response.headers, data)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+_shared_pools: Dict[Tuple[int, Optional[float]], ConnectionPool] = {}
+_shared_pools_lock = threading.Lock()
+
+def shared_pool(maxsize: int = DEFAULT_POOL_SIZE, timeout: Optional[float] = DEFAULT_HTTP_TIMEOUT) -> ConnectionPool:
+    key = (maxsize, timeout)
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = _shared_pools[key] = ConnectionPool(maxsize, timeout)
+
+    return pool
+
+
+def resolve_transport(transport: Transport_t, pool_size: int = DEFAULT_POOL_SIZE,
+                      http_timeout: Optional[float] = DEFAULT_HTTP_TIMEOUT) -> Optional[ConnectionPool]:
+    if isinstance(transport, ConnectionPool):
+        return transport
+    elif transport == POOLED:
+        return shared_pool(pool_size, http_timeout)
+    elif transport == URLLIB:
+        return None
+
+    raise ValueError(f"`transport` expected one of {TRANSPORTS} or a `ConnectionPool` but got `{transport}`")
+
+
+@lru_cache(maxsize=None)
+def _pooled_web_client_class() -> type:
+    # Defined on first use so that importing this module does not import slack_sdk
+    from urllib.error import HTTPError
+    from urllib.request import Request
+
+    from slack_sdk import WebClient
+
+    class PooledWebClient(WebClient):
+        def __init__(self, *args: Any, pool: ConnectionPool, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            self.pool = pool
+
+        def _perform_urllib_http_request_internal(self, url: str, req: Request) -> Dict[str, Any]:
+            if self.proxy is not None or not url.lower().startswith("http"):
+                return super()._perform_urllib_http_request_internal(url, req)
+
+            status, reason, headers, data = self.pool.request(
+                req.get_method(), req.full_url, req.data, dict(req.header_items()), self.timeout
+            )
+            if status >= 400:
+                # slack_sdk handles 429 and retries by catching urllib's HTTPError
+                raise HTTPError(url, status, reason, headers, io.BytesIO(data))
+
+            if headers.get_content_type() == "application/gzip":
+                return {"status": status, "headers": headers, "body": data}
+
+            charset = headers.get_content_charset() or "utf-8"
+            return {"status": status, "headers": headers, "body": data.decode(charset)}
+
+    return PooledWebClient
+
+
+def create_web_client(token: str, pool: Optional[ConnectionPool] = None, **kwargs: Any) -> "WebClient":
+    if pool is None:
+        from slack_sdk import WebClient
+
+        return WebClient(token=token, **kwargs)
+
+    if pool.timeout is not None:
+        kwargs.setdefault("timeout", pool.timeout)
+
+    return _pooled_web_client_class()(token=token, pool=pool, **kwargs)
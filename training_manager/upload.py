@@ -0,0 +1,232 @@
+"upload.py"
+
+import hashlib
+import logging
+import os
+import time
+
+try:
+    from typing import Union, Optional, Iterable, Iterator, Callable, NamedTuple, BinaryIO
+except ImportError:
+    from typing_extensions import Union, Optional, Iterable, Iterator, Callable, NamedTuple, BinaryIO # type: ignore
+
+import io
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 4 << 20
+
+Progress_t = Callable[[int, int, float], None]
+
+
+class UploadTimeout(TimeoutError):
+    pass
+
+
+class UploadStats(NamedTuple):
+    bytes: int
+    seconds: float
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else float("inf")
+
+
+def iter_file_chunks(path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    # One reusable buffer: memory stays at `chunk_size` whatever the file size
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            yield view[:n]
+
+
+def stream_upload(
+    url: str,
+    chunks: Iterable[Union[bytes, memoryview]],
+    length: int,
+    timeout: Optional[float] = None,
+    on_progress: Optional[Progress_t] = None,
+) -> UploadStats:
+    from http.client import HTTPConnection, HTTPSConnection
+    from urllib.parse import urlsplit
+
+    started = time.monotonic()
+    deadline = None if timeout is None else started + timeout
+
+    def remaining() -> Optional[float]:
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise UploadTimeout(f"Upload did not finish within {timeout} seconds")
+        return left
+
+    parts = urlsplit(url)
+    connection_cls = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+    conn = connection_cls(parts.hostname, parts.port, timeout=remaining())
+    try:
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn.putrequest("POST", path)
+        conn.putheader("Content-Type", "application/octet-stream")
+        conn.putheader("Content-Length", str(length))
+        conn.endheaders()
+
+        sent = 0
+        for chunk in chunks:
+            if conn.sock is not None:
+                conn.sock.settimeout(remaining())
+            conn.send(chunk)
+            sent += len(chunk)
+            if on_progress is not None:
+                on_progress(sent, length, sent / max(time.monotonic() - started, 1e-9))
+
+        if sent != length:
+            raise ValueError(f"Upload sent {sent} bytes but announced {length}")
+
+        if conn.sock is not None:
+            conn.sock.settimeout(remaining())
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise OSError(f"Upload failed with HTTP {response.status}: {body[:200]!r}")
+    finally:
+        conn.close()
+
+    stats = UploadStats(sent, time.monotonic() - started)
+    logger.info("Uploaded %d bytes in %.2f s (%.1f MB/s)", stats.bytes, stats.seconds, stats.bytes_per_sec / 1e6)
+
+    return stats
+
+
+def file_length(path: Union[str, Path]) -> int:
+    return os.stat(path).st_size
+
+
+def iter_buffer_chunks(view: memoryview, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    for i in range(0, len(view), chunk_size):
+        yield view[i:i + chunk_size]
+
+
+def iter_fileobj_chunks(f: BinaryIO, start: int, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    f.seek(start)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    readinto = getattr(f, "readinto", None)
+    while True:
+        if readinto is not None:
+            n = readinto(buffer)
+        else:
+            data = f.read(chunk_size)
+            n = len(data)
+            buffer[:n] = data
+        if not n:
+            break
+        yield view[:n]
+
+
+Buffer_t = Union[bytes, bytearray, memoryview]
+FileLike_t = Union[str, Path, Buffer_t, BinaryIO]
+
+
+class UploadSource:
+    def __init__(self, filename: str, length: int, chunks: Callable[[], Iterator[Union[bytes, memoryview]]],
+                 path: Optional[Path] = None, owned: bool = False) -> None:
+        self.filename = filename
+        self.length = length
+        self.path = path
+        # False while the chunks are read from an object the caller can still close, reuse or mutate
+        self.owned = owned
+        self._chunks = chunks
+
+    def chunks(self) -> Iterator[Union[bytes, memoryview]]:
+        # Every call starts over, so a source can be read more than once (hashing, compression)
+        return self._chunks()
+
+    def snapshot(self) -> "UploadSource":
+        # For a source read after send_file returns (queued mode): copies what the caller still controls
+        if self.path is not None or self.owned:
+            return self
+
+        data = io.BytesIO()
+        for chunk in self.chunks():
+            data.write(chunk)
+
+        return UploadSource.from_buffer(data.getvalue(), self.filename)
+
+    @classmethod
+    def from_path(cls, path: Path) -> "UploadSource":
+        return cls(path.name, file_length(path), lambda: iter_file_chunks(path), path, owned=True)
+
+    @classmethod
+    def from_buffer(cls, buffer: Buffer_t, filename: str) -> "UploadSource":
+        view = memoryview(buffer)
+        if not view.contiguous:
+            raise ValueError("`path` buffer must be contiguous")
+        view = view.cast("B")
+
+        return cls(filename, len(view), lambda: iter_buffer_chunks(view), owned=isinstance(buffer, bytes))
+
+    @classmethod
+    def from_fileobj(cls, f: BinaryIO, filename: str) -> "UploadSource":
+        if isinstance(f, io.BytesIO):
+            # Upload straight from the BytesIO memory instead of reading it out
+            view = f.getbuffer()[f.tell():]
+            return cls(filename, len(view), lambda: iter_buffer_chunks(view))
+
+        # Any object with `read()` is accepted; one without `seekable()` is read out like a pipe
+        seekable = getattr(f, "seekable", None)
+        if not callable(seekable) or not seekable():
+            return cls.from_buffer(f.read(), filename)
+
+        start = f.tell()
+        length = f.seek(0, io.SEEK_END) - start
+        f.seek(start)
+
+        return cls(filename, length, lambda: iter_fileobj_chunks(f, start))
+
+    @classmethod
+    def create(cls, obj: FileLike_t, filename: Optional[str] = None) -> "UploadSource":
+        if isinstance(obj, (str, Path)):
+            path = Path(obj)
+            if not path.is_file():
+                raise ValueError(f"Specified `path` is not valid file")
+            source = cls.from_path(path)
+            if filename is not None:
+                source.filename = filename
+            return source
+
+        if not isinstance(obj, (bytes, bytearray, memoryview)) and not callable(getattr(obj, "read", None)):
+            raise TypeError(f"`path` expected `str`, `pathlib.Path`, bytes-like or binary file object but got `{type(obj).__name__}`")
+
+        if filename is None:
+            name = getattr(obj, "name", None)
+            if not isinstance(name, str):
+                raise ValueError("`filename` is required when uploading from memory")
+            filename = os.path.basename(name)
+
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            return cls.from_buffer(obj, filename)
+
+        return cls.from_fileobj(obj, filename)
+
+
+def hash_source(source: UploadSource) -> str:
+    digest = hashlib.sha256()
+    if source.path is None or source.length < MMAP_THRESHOLD:
+        for chunk in source.chunks():
+            digest.update(chunk)
+    else:
+        import mmap
+
+        # hashlib reads the mapping directly (and drops the GIL), with no copy into Python buffers
+        with open(source.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+
+    return digest.hexdigest()
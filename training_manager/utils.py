@@ -0,0 +1,64 @@
+"utils.py"
+
+import hashlib
+
+try:
+    from typing import Optional, Mapping, Any
+except ImportError:
+    from typing_extensions import Optional, Mapping, Any # type: ignore
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def slack_api_error() -> type:
+    # Imported on demand so that `import training_manager` stays free of slack_sdk
+    from slack_sdk.errors import SlackApiError
+
+    return SlackApiError
+
+
+# conversations.open errors that mean `user_id` names no one the bot can DM, rather than Slack being unavailable
+RECIPIENT_ERRORS = frozenset((
+    "user_not_found", "user_not_visible", "user_disabled", "channel_not_found", "cannot_dm_bot",
+    "invalid_users", "users_list_not_supplied",
+))
+
+
+def response_status(response: Any) -> Optional[int]:
+    # A SlackResponse has `status_code`; a body slack_sdk could not parse (an HTML 503 from a proxy) leaves
+    # urllib's raw dict with "status", or aiohttp's response with `status`
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = response.get("status") if isinstance(response, dict) else getattr(response, "status", None)
+    try:
+        return None if status is None else int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def response_headers(response: Any) -> Optional[Mapping[str, Any]]:
+    if isinstance(response, dict):
+        return response.get("headers")
+
+    return getattr(response, "headers", None)
+
+
+def slack_error_code(error: BaseException) -> str:
+    # The code for a `(False, code)` result, also when the body was not Slack's JSON
+    response = getattr(error, "response", None)
+    try:
+        code = response["error"]
+    except (KeyError, TypeError, IndexError):
+        code = None
+    if isinstance(code, str) and code:
+        return code
+
+    status = response_status(response)
+    if status == 429:
+        return "ratelimited"
+    if status is not None and status >= 500:
+        return "service_unavailable"
+
+    return "invalid_response" if status is None else f"http_{status}"
@@ -0,0 +1,153 @@
+"values.py"
+
+import numbers
+
+try:
+    from typing import Tuple, Optional, Any, Callable
+except ImportError:
+    from typing_extensions import Tuple, Optional, Any, Callable # type: ignore
+
+from .sender import Job
+
+
+# Kinds whose `optionals` hold user values; progress and training start carry a list of them, error and result one
+LIST_KINDS = frozenset(("training_start", "progress"))
+DICT_KINDS = frozenset(("error", "result"))
+
+
+def is_array_like(value: Any) -> bool:
+    # NumPy arrays and scalars, PyTorch / JAX / TensorFlow / CuPy tensors; Python numbers and strings are not
+    if isinstance(value, (str, bytes, bytearray, numbers.Number)):
+        return False
+
+    return hasattr(value, "__array__") or callable(getattr(value, "item", None))
+
+
+class Summary:
+    # What a non-scalar array is shown as: its statistics rather than its elements
+    __slots__ = ("mean", "std", "min", "max", "shape")
+
+    def __init__(self, mean: float, std: float, min: float, max: float, shape: Tuple[int, ...]) -> None:
+        self.mean = mean
+        self.std = std
+        self.min = min
+        self.max = max
+        self.shape = shape
+
+    def __repr__(self) -> str:
+        return f"Summary(mean={self.mean!r}, std={self.std!r}, min={self.min!r}, max={self.max!r}, shape={self.shape!r})"
+
+    def __str__(self) -> str:
+        shape = "×".join(str(n) for n in self.shape)
+        return f"{self.mean:.6g} ± {self.std:.6g} (min {self.min:.6g} / max {self.max:.6g}, {shape})"
+
+
+class RankStats:
+    # What a value that differs between ranks is shown as: the mean and range over the ranks that reported it
+    __slots__ = ("mean", "min", "max", "n")
+
+    def __init__(self, mean: float, min: float, max: float, n: int) -> None:
+        self.mean = mean
+        self.min = min
+        self.max = max
+        self.n = n
+
+    def __repr__(self) -> str:
+        return f"RankStats(mean={self.mean!r}, min={self.min!r}, max={self.max!r}, n={self.n!r})"
+
+    def __str__(self) -> str:
+        return f"{self.mean:.6g} (min {self.min:.6g} / max {self.max:.6g}, n={self.n})"
+
+
+def summarize(array: Any) -> Summary:
+    import numpy as np
+
+    values = np.asarray(array, dtype=np.float64)
+
+    return Summary(float(values.mean()), float(values.std()), float(values.min()), float(values.max()), tuple(values.shape))
+
+
+def detach(value: Any) -> Any:
+    # Drops the autograd graph so a queued value does not keep it alive; no copy and no device sync
+    detach = getattr(value, "detach", None)
+
+    return detach() if callable(detach) else value
+
+
+def detach_optional(optional: Optional[dict]) -> Optional[dict]:
+    # Runs on the caller's thread, so it only looks at each value; always a new dict, because a queued
+    # job must not see the caller reuse the same dict for the next step
+    if optional is None:
+        return None
+
+    return {key: detach(value) if is_array_like(value) else value for key, value in optional.items()}
+
+
+def resolve(value: Any) -> Any:
+    # Runs on the sender's thread: this is where a device tensor is synchronized and copied to the host
+    if not is_array_like(value):
+        return value
+
+    value = detach(value)
+    if callable(getattr(value, "cpu", None)):
+        value = value.cpu()
+    elif hasattr(value, "__cuda_array_interface__") and callable(getattr(value, "get", None)):
+        # CuPy refuses implicit conversion to NumPy
+        value = value.get()
+
+    try:
+        import numpy as np
+    except ImportError:
+        # PyTorch works without NumPy; only scalars can be read then
+        try:
+            return value.item()
+        except (TypeError, ValueError, RuntimeError):
+            return f"{value}"
+
+    try:
+        array = np.asarray(value)
+    except (TypeError, ValueError, RuntimeError):
+        return f"{value}"
+
+    if array.size == 1:
+        return array.item()
+    if array.size == 0 or array.dtype.kind not in "biuf":
+        return f"{array}"
+
+    return summarize(array)
+
+
+def resolve_optional(optional: Optional[dict]) -> Optional[dict]:
+    if optional is None or not any(is_array_like(value) for value in optional.values()):
+        return optional
+
+    return {key: resolve(value) for key, value in optional.items()}
+
+
+def map_optionals(job: Job, function: Callable[[Optional[dict]], Optional[dict]]) -> Job:
+    if job.kind in LIST_KINDS:
+        id, optionals, *rest = job.args
+        if optionals is not None:
+            return job._replace(args=(id, [function(optional) for optional in optionals], *rest))
+    elif job.kind in DICT_KINDS:
+        id, optional, *rest = job.args
+        return job._replace(args=(id, function(optional), *rest))
+
+    return job
+
+
+def detach_job(job: Job) -> Job:
+    return map_optionals(job, detach_optional)
+
+
+def resolve_job(job: Job) -> Job:
+    return map_optionals(job, resolve_optional)
+
+
+def to_float(value: Any) -> Optional[float]:
+    # Plain numbers and scalar tensors; None for anything that is not a single real number
+    value = resolve(value)
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+
+    return None